@@ -1,16 +1,53 @@
 import os
+import logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
+from markupsafe import Markup
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, jsonify, abort, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.schema import CreateIndex
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 import uuid
 import bleach
 from bleach.sanitizer import Cleaner
 import re
 from urllib.parse import urlparse
 import secrets
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from jinja2 import FileSystemBytecodeCache
+from utils.speedtest import (
+    LOCALIDADE_PADRAO, METRICAS, BufferResultados,
+    calcular_latencia, extrair_localidades, filtrar_grupos, resumir_latencias
+)
+from utils.fragmentos import versao_configs
+from utils.exportacao import CHAVE_EXPORTACAO, ExportadorEstatico
+from utils.cache import GerenciadorCache, cache_resposta, criar_backend
+from utils.tarefas import ExecutorTarefas
+from utils.manutencao import CheckpointsManutencao, executar_em_lotes
+from utils.replica import RoteadorReplica, criar_sessao_roteada
+from utils.limites import (
+    LimitadorRequisicoes, MedidorLatenciaBanco, RegraLimite, regra_do_ambiente, tempo_de_fila
+)
+from utils.planos import ORDENACOES, preco_em_centavos, velocidade_em_mbps
+from utils.logs import AmostradorAcesso, configurar_logs, duracao_ms
+from utils.saude import INDISPONIVEL, VerificadorProntidao
+from utils.diretorios import diretorio_privado
+from utils.dados import (
+    FORMATOS, booleano, data_hora, detectar_formato, em_lotes,
+    escrever_registros, identificador, ler_registros
+)
+from utils.uploads import ArquivoEmValidacao, UploadInvalido, UploadRecusado
+import click
+
+INICIO_IMPORTACAO = time.perf_counter()
 
 # ========================================
 # CONFIGURAÇÃO DA APLICAÇÃO
@@ -39,8 +76,28 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+
+# Réplica somente leitura opcional para as rotas públicas
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL and DATABASE_REPLICA_URL.startswith("postgres://"):
+    DATABASE_REPLICA_URL = DATABASE_REPLICA_URL.replace("postgres://", "postgresql://", 1)
+if DATABASE_REPLICA_URL:
+    opcoes_replica = {'url': DATABASE_REPLICA_URL, 'pool_pre_ping': True}
+    if DATABASE_REPLICA_URL.startswith('postgresql'):
+        opcoes_replica['connect_args'] = {'connect_timeout': 2}
+    app.config['SQLALCHEMY_BINDS'] = {'replica': opcoes_replica}
+REPLICA_INTERVALO_VERIFICACAO = float(os.environ.get('REPLICA_INTERVALO_VERIFICACAO', 10))
+REPLICA_FIXAR_PRIMARIO_SEGUNDOS = int(os.environ.get('REPLICA_FIXAR_PRIMARIO_SEGUNDOS', 30))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Cache de bytecode dos templates, compartilhado pelos workers do gunicorn.
+# Sem JINJA_CACHE_DIR, o Jinja usa o próprio diretório privado por usuário (_jinja2-cache-<uid>)
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR')
+app.jinja_options = {
+    **app.jinja_options,
+    'bytecode_cache': FileSystemBytecodeCache(diretorio_privado(JINJA_CACHE_DIR) if JINJA_CACHE_DIR else None)
+}
+
 # Configurações de segurança
 ADMIN_URL_PREFIX = os.environ.get('ADMIN_URL_PREFIX', '/gestao-exclusiva-netfyber')
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)
@@ -53,8 +110,139 @@ app.config['MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024  # 8MB
 ADMIN_IPS = os.environ.get('ADMIN_IPS', '').split(',') if os.environ.get('ADMIN_IPS') else []
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+UPLOAD_MAX_DIMENSAO = int(os.environ.get('UPLOAD_MAX_DIMENSAO', 6000))  # pixels (largura ou altura)
+
+# Configuração do velocímetro (gravação em lotes dos resultados)
+VELOCIMETRO_TAMANHO_LOTE = int(os.environ.get('VELOCIMETRO_TAMANHO_LOTE', 100))
+VELOCIMETRO_INTERVALO_LOTE = float(os.environ.get('VELOCIMETRO_INTERVALO_LOTE', 5))
+VELOCIMETRO_MAX_PENDENTES = int(os.environ.get('VELOCIMETRO_MAX_PENDENTES', 5000))
+VELOCIMETRO_MAX_AMOSTRAS = 100
+# Estatísticas: resultados gravados nos últimos N dias, recalculadas após cada gravação em lote.
+# O TTL só limita a idade do resumo quando não chegam novos resultados
+VELOCIMETRO_JANELA_DIAS = int(os.environ.get('VELOCIMETRO_JANELA_DIAS', 30))
+VELOCIMETRO_MAX_LINHAS_ESTATISTICAS = int(os.environ.get('VELOCIMETRO_MAX_LINHAS_ESTATISTICAS', 20000))
+VELOCIMETRO_TTL_ESTATISTICAS = int(os.environ.get('VELOCIMETRO_TTL_ESTATISTICAS', 3600))
+
+# Cache (memoria | sqlite | redis). Com mais de um worker, use sqlite ou redis
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memoria')
+CACHE_URL = os.environ.get('CACHE_URL') or (
+    os.path.join(diretorio_privado(nome='netfyber-cache'), 'cache.sqlite3') if CACHE_BACKEND == 'sqlite' else None
+)
+CACHE_MAX_ITENS = int(os.environ.get('CACHE_MAX_ITENS', 0)) or None
+CACHE_TTL_PAGINAS = int(os.environ.get('CACHE_TTL_PAGINAS', 300))
+
+# Tarefas em segundo plano
+TAREFAS_TRABALHADORES = int(os.environ.get('TAREFAS_TRABALHADORES', 2))
+TAREFAS_TAMANHO_FILA = int(os.environ.get('TAREFAS_TAMANHO_FILA', 100))
+TAREFAS_MAX_TENTATIVAS = int(os.environ.get('TAREFAS_MAX_TENTATIVAS', 5))
+
+# Paginação do blog
+BLOG_POSTS_POR_PAGINA = int(os.environ.get('BLOG_POSTS_POR_PAGINA', 10))
+
+# Exportação estática do site público (vazio = reconstrução incremental desativada)
+EXPORTACAO_ESTATICA_DIR = os.environ.get('EXPORTACAO_ESTATICA_DIR', '')
+# URL do Flask para onde o _redirects encaminha as rotas dinâmicas (ex.: https://app.onrender.com)
+EXPORTACAO_ORIGEM_URL = os.environ.get('EXPORTACAO_ORIGEM_URL', '')
+
+# Quantidade de proxies à frente da aplicação (X-Forwarded-For confiável para o IP do cliente)
+PROXIES_CONFIAVEIS = int(os.environ.get('PROXIES_CONFIAVEIS', 0))
+if PROXIES_CONFIAVEIS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXIES_CONFIAVEIS, x_proto=PROXIES_CONFIAVEIS)
+
+# Limite das APIs públicas: "taxa/rajada" em requisições por segundo, por cliente e global.
+# Ex.: LIMITE_API_PLANOS_CLIENTE=2/10 LIMITE_API_PLANOS_GLOBAL=50/100 (0/0 bloqueia)
+LIMITES_API = {
+    'api_planos': regra_do_ambiente(os.environ, 'LIMITE_API_PLANOS', RegraLimite(2, 10, 50, 100)),
+    'api_blog_posts': regra_do_ambiente(os.environ, 'LIMITE_API_BLOG', RegraLimite(1, 5, 20, 40)),
+}
+# Descarte de carga (503) nessas APIs: tempo de fila no proxy e latência média do banco (0 = desligado)
+LIMITE_MAX_FILA_MS = float(os.environ.get('LIMITE_MAX_FILA_MS', 0))
+LIMITE_MAX_LATENCIA_BANCO_MS = float(os.environ.get('LIMITE_MAX_LATENCIA_BANCO_MS', 250))
+# Consultas mínimas nos últimos 10s para a média do banco valer (evita descarte por uma amostra isolada)
+LIMITE_MIN_AMOSTRAS_BANCO = int(os.environ.get('LIMITE_MIN_AMOSTRAS_BANCO', 5))
+LIMITE_RETRY_AFTER = int(os.environ.get('LIMITE_RETRY_AFTER', 5))
+
+# Logs em JSON: fila limitada (descarta quando cheia) e amostragem do log de acesso
+LOG_NIVEL = os.environ.get('LOG_NIVEL', 'INFO').upper()
+LOG_TAMANHO_FILA = int(os.environ.get('LOG_TAMANHO_FILA', 10000))
+LOG_AMOSTRAGEM_ACESSO = float(os.environ.get('LOG_AMOSTRAGEM_ACESSO', 0.1))  # 0 a 1
+LOG_ACESSO_LENTO_MS = float(os.environ.get('LOG_ACESSO_LENTO_MS', 1000))  # sempre registradas
+
+# Prontidão (/health/ready): intervalo das verificações em segundo plano e limites
+PRONTIDAO_INTERVALO = float(os.environ.get('PRONTIDAO_INTERVALO', 5))
+PRONTIDAO_MAX_LATENCIA_BANCO_MS = float(os.environ.get('PRONTIDAO_MAX_LATENCIA_BANCO_MS', 500))
+PRONTIDAO_MAX_SATURACAO_POOL = float(os.environ.get('PRONTIDAO_MAX_SATURACAO_POOL', 0.9))
+
+# ========================================
+# LOGS
+# ========================================
 
-db = SQLAlchemy(app)
+def campos_da_requisicao():
+    """Campos incluídos em todo registro emitido durante uma requisição"""
+    if not has_request_context():
+        return {}
+    return {
+        'request_id': g.get('request_id'),
+        'metodo': request.method,
+        'caminho': request.path,
+        'ip': request.remote_addr,
+    }
+
+handler_logs = configurar_logs(LOG_NIVEL, LOG_TAMANHO_FILA, obter_campos=campos_da_requisicao)
+amostrador_acesso = AmostradorAcesso(LOG_AMOSTRAGEM_ACESSO, LOG_ACESSO_LENTO_MS)
+logger = logging.getLogger('netfyber')
+logger_acesso = logging.getLogger('netfyber.acesso')
+logger_auditoria = logging.getLogger('netfyber.auditoria')
+
+db = SQLAlchemy(app, session_options={'class_': criar_sessao_roteada(lambda: roteador_replica)})
+
+# ========================================
+# CACHE
+# ========================================
+
+gerenciador_cache = GerenciadorCache(criar_backend(
+    CACHE_BACKEND,
+    url=CACHE_URL if CACHE_BACKEND != 'memoria' else None,
+    max_itens=CACHE_MAX_ITENS
+))
+cache_configs = gerenciador_cache.namespace('configs', ttl=300)
+cache_fragmentos = gerenciador_cache.namespace('fragmentos', ttl=3600)
+cache_paginas = gerenciador_cache.namespace('paginas', ttl=CACHE_TTL_PAGINAS)
+cache_api = gerenciador_cache.namespace('api', ttl=CACHE_TTL_PAGINAS)
+
+# Endpoints públicos somente leitura que podem ser atendidos pela réplica
+ENDPOINTS_REPLICA = {
+    'index', 'planos', 'blog', 'velocimetro', 'sobre', 'api_planos', 'api_blog_posts'
+}
+
+roteador_replica = RoteadorReplica(
+    db,
+    endpoints=ENDPOINTS_REPLICA,
+    intervalo_verificacao=REPLICA_INTERVALO_VERIFICACAO,
+    fixar_segundos=REPLICA_FIXAR_PRIMARIO_SEGUNDOS,
+    cache=gerenciador_cache.namespace('replica', ttl=REPLICA_FIXAR_PRIMARIO_SEGUNDOS)
+)
+with app.app_context():
+    roteador_replica.iniciar()
+
+# ========================================
+# LIMITE DE REQUISIÇÕES DAS APIs PÚBLICAS
+# ========================================
+
+limitador_api = LimitadorRequisicoes(
+    LIMITES_API,
+    max_fila_ms=LIMITE_MAX_FILA_MS,
+    max_latencia_banco_ms=LIMITE_MAX_LATENCIA_BANCO_MS,
+    retry_after_descarte=LIMITE_RETRY_AFTER,
+    medidor=MedidorLatenciaBanco(min_amostras=LIMITE_MIN_AMOSTRAS_BANCO)
+)
+with app.app_context():
+    for engine in db.engines.values():
+        limitador_api.medidor.registrar_eventos(engine)
+
+def cache_desativado():
+    """Sem cache em debug e durante a exportação estática (URLs de assets diferem)"""
+    return app.debug or bool(request.environ.get(CHAVE_EXPORTACAO))
 
 # ========================================
 # SISTEMA DE AUTENTICAÇÃO
@@ -203,6 +391,20 @@ def validate_url(url):
     except Exception:
         return False
 
+def gerar_resumo(conteudo):
+    """Resumo em texto simples (150 caracteres) a partir do conteúdo do post"""
+    conteudo_limpo = re.sub(r'<[^>]+>', '', conteudo)
+    conteudo_limpo = re.sub(r'\*\*.*?\*\*', '', conteudo_limpo)
+    return conteudo_limpo[:150] + '...' if len(conteudo_limpo) > 150 else conteudo_limpo
+
+def validar_post(titulo, conteudo, categoria, link_materia):
+    """Regras de validação de posts (formulário e importação). Retorna a mensagem de erro ou None."""
+    if not all([titulo, conteudo, categoria, link_materia]):
+        return 'Todos os campos obrigatórios devem ser preenchidos.'
+    if not validate_url(link_materia):
+        return 'URL da matéria inválida.'
+    return None
+
 def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida"""
     if not filename:
@@ -254,12 +456,25 @@ class Plano(db.Model):
     nome = db.Column(db.String(100), nullable=False)
     preco = db.Column(db.String(20), nullable=False)
     velocidade = db.Column(db.String(50))
+    # Valores convertidos de preco/velocidade, para filtros e ordenação no banco
+    preco_centavos = db.Column(db.Integer, nullable=True)
+    velocidade_mbps = db.Column(db.Integer, nullable=True)
     features = db.Column(db.Text, nullable=False)
     recomendado = db.Column(db.Boolean, default=False)
     ordem_exibicao = db.Column(db.Integer, default=0)
     ativo = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_plano_ativo_preco', 'ativo', 'preco_centavos'),
+        db.Index('ix_plano_ativo_velocidade', 'ativo', 'velocidade_mbps'),
+    )
+
+    def atualizar_valores_numericos(self):
+        """Converte preço e velocidade (chamado nas escritas e pela manutenção)"""
+        self.preco_centavos = preco_em_centavos(self.preco)
+        self.velocidade_mbps = velocidade_em_mbps(self.velocidade) or velocidade_em_mbps(self.nome, exigir_unidade=True)
+
     def get_features_list(self):
         """Retorna lista de features sanitizada"""
         if not self.features:
@@ -282,6 +497,7 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
     conteudo = db.Column(db.Text, nullable=False)
+    conteudo_html = db.Column(db.Text, nullable=True)
     resumo = db.Column(db.Text, nullable=False)
     categoria = db.Column(db.String(50), nullable=False)
     imagem = db.Column(db.String(200), default='default.jpg')
@@ -291,11 +507,17 @@ class Post(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    def renderizar_conteudo(self):
+        """Gera e guarda o HTML sanitizado (chamado nas escritas e pela manutenção)"""
+        self.conteudo_html = sanitize_html(self.conteudo) if self.conteudo else None
+
     def get_conteudo_html(self):
         """Retorna o conteúdo sanitizado em HTML seguro"""
         try:
             if not self.conteudo:
                 return "<p>Conteúdo não disponível.</p>"
+            if self.conteudo_html:
+                return self.conteudo_html
             return sanitize_html(self.conteudo)
         except Exception:
             return f"<div style='white-space: pre-line;'>{bleach.clean(self.conteudo or '')}</div>"
@@ -311,6 +533,36 @@ class Post(db.Model):
             return f"/static/uploads/blog/{safe_filename}"
         return "/static/images/blog/default.jpg"
 
+class ResultadoVelocimetro(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    plano_id = db.Column(db.Integer, db.ForeignKey('plano.id'), nullable=True, index=True)
+    localidade = db.Column(db.String(60), nullable=False, default=LOCALIDADE_PADRAO, index=True)
+    ping_ms = db.Column(db.Float, nullable=True)
+    jitter_ms = db.Column(db.Float, nullable=True)
+    perda_pct = db.Column(db.Float, nullable=False, default=0)
+    download_mbps = db.Column(db.Float, nullable=True)
+    upload_mbps = db.Column(db.Float, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class CheckpointManutencao(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), unique=True, nullable=False)
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Tarefa(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False, index=True)
+    argumentos = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)
+    tentativas = db.Column(db.Integer, default=0)
+    executar_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    iniciada_em = db.Column(db.DateTime, nullable=True)
+    concluida_em = db.Column(db.DateTime, nullable=True)
+    duracao_ms = db.Column(db.Float, nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 @login_manager.user_loader
 def load_user(user_id):
     return AdminUser.query.get(int(user_id))
@@ -319,40 +571,125 @@ def load_user(user_id):
 # MIDDLEWARE DE SEGURANÇA
 # ========================================
 
+@app.before_request
+def iniciar_requisicao():
+    """Identificador da requisição (repassado pelo proxy ou gerado) e início da medição"""
+    g.inicio_requisicao = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+
+@app.after_request
+def registrar_acesso(response):
+    """Log de acesso amostrado; erros e requisições lentas são sempre registrados"""
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    inicio = g.get('inicio_requisicao')
+    if inicio is None:
+        return response
+    duracao = duracao_ms(inicio)
+    if amostrador_acesso.registrar(response.status_code, duracao):
+        fila = tempo_de_fila(request.headers.get('X-Request-Start'))
+        logger_acesso.info('acesso', extra={
+            'status': response.status_code,
+            'duracao_ms': duracao,
+            'fila_ms': round(fila * 1000, 2) if fila is not None else None,
+            'endpoint': request.endpoint,
+            'tamanho': response.calculate_content_length(),
+            'amostragem': LOG_AMOSTRAGEM_ACESSO,
+        })
+    return response
+
+@app.before_request
+def limitar_apis_publicas():
+    """Token bucket e descarte de carga para as APIs JSON (ver utils/limites.py)"""
+    if not limitador_api.limita(request.endpoint):
+        return None
+    rejeicao = limitador_api.verificar(
+        request.endpoint,
+        request.remote_addr,
+        tempo_de_fila(request.headers.get('X-Request-Start'))
+    )
+    if rejeicao is None:
+        return None
+    status, retry_after, motivo = rejeicao
+    mensagem = 'Muitas requisições' if status == 429 else 'Serviço temporariamente sobrecarregado'
+    resposta = jsonify({'erro': mensagem, 'motivo': motivo})
+    resposta.status_code = status
+    resposta.headers['Retry-After'] = str(retry_after)
+    return resposta
+
+@app.before_request
+def iniciar_executor_tarefas():
+    """Garante o pool e o coletor de tarefas no worker (retoma pendentes após reinício)"""
+    # As renderizações internas da exportação também rodam em `flask congelar`,
+    # onde o pool não deve ser iniciado
+    if not request.environ.get(CHAVE_EXPORTACAO):
+        executor_tarefas.iniciar()
+
+@app.before_request
+def rotear_leituras():
+    """Define se esta requisição lê da réplica (ver utils/replica.py)"""
+    g.usar_replica = roteador_replica.decidir(request.endpoint, request.method)
+
 @app.before_request
 def restrict_admin_access():
     """Restrição de IP para área administrativa (opcional)"""
     if ADMIN_IPS and request.path.startswith(ADMIN_URL_PREFIX):
         client_ip = request.remote_addr
         if client_ip not in ADMIN_IPS:
-            print(f"Tentativa de acesso não autorizado de IP: {client_ip}")
+            logger_auditoria.warning('Acesso administrativo negado pelo IP', extra={'evento': 'ip_bloqueado'})
             abort(403, description="Acesso não autorizado")
 
 # ========================================
 # FUNÇÕES DE ARQUIVO SEGURAS
 # ========================================
 
+class RequisicaoComUploads(Request):
+    """Valida as imagens enquanto o corpo multipart é lido (ver utils/uploads.py)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and not allowed_file(filename):
+            raise UploadRecusado('Tipo de arquivo não permitido')
+        return ArquivoEmValidacao(
+            app.config['UPLOAD_FOLDER'],
+            max_bytes=app.config['MAX_CONTENT_LENGTH'],
+            max_dimensao=UPLOAD_MAX_DIMENSAO,
+            tipos_permitidos=ALLOWED_EXTENSIONS
+        )
+
+app.request_class = RequisicaoComUploads
+
+@app.before_request
+def ler_formulario_com_upload():
+    """
+    Lê o formulário multipart do admin antes da view: um upload recusado
+    interrompe a leitura aqui e cai em upload_recusado, em vez de no
+    try/except genérico das views.
+    """
+    if (request.method == 'POST' and request.mimetype == 'multipart/form-data'
+            and request.path.startswith(ADMIN_URL_PREFIX) and current_user.is_authenticated):
+        request.files
+
+@app.errorhandler(UploadRecusado)
+def upload_recusado(error):
+    logger_auditoria.warning('Upload recusado', extra={'evento': 'upload_recusado', 'motivo': error.description})
+    flash(f'Imagem recusada: {error.description}', 'error')
+    resposta = redirect(request.url, code=303)
+    # O restante do corpo não foi lido; fechar a conexão evita que o servidor o consuma
+    resposta.headers['Connection'] = 'close'
+    return resposta
+
 def save_uploaded_file(file):
-    """Salvamento seguro de arquivos"""
+    """Move a imagem já validada durante a leitura do formulário para o destino"""
     if not file or file.filename == '':
         return None
-    
-    if not allowed_file(file.filename):
-        return None
-    
+
     try:
-        filename = f"{uuid.uuid4().hex}.{file.filename.rsplit('.', 1)[1].lower()}"
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-            return filename
-    except Exception as e:
-        print(f"Erro ao salvar arquivo: {e}")
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-    
+        return file.stream.salvar(uuid.uuid4().hex)
+    except UploadInvalido as e:
+        logger_auditoria.warning('Upload recusado', extra={'evento': 'upload_recusado', 'arquivo': file.filename, 'motivo': str(e)})
+    except Exception:
+        logger.exception('Erro ao salvar arquivo')
+
     return None
 
 def delete_uploaded_file(filename):
@@ -380,13 +717,54 @@ def delete_uploaded_file(filename):
 # ========================================
 
 @app.route('/')
+@cache_resposta(cache_paginas, tags=['configs'], ignorar=cache_desativado)
 def index():
     return render_template('public/index.html', configs=get_configs())
 
+# Parâmetros de query string lidos por consultar_planos (e que entram na chave do cache)
+PARAMETROS_FILTRO_PLANOS = ('min_speed', 'max_price', 'sort')
+
+def consultar_planos(args):
+    """
+    Planos ativos com os filtros da query string, aplicados no banco:
+    min_speed (Mbps), max_price (reais, ex.: 99,90) e sort (price, -price, speed, -speed).
+    Levanta ValueError para parâmetros inválidos.
+    """
+    consulta = Plano.query.filter_by(ativo=True)
+
+    min_speed = args.get('min_speed', '').strip()
+    if min_speed:
+        if not min_speed.isdigit():
+            raise ValueError('min_speed deve ser um número inteiro (Mbps)')
+        consulta = consulta.filter(Plano.velocidade_mbps >= int(min_speed))
+
+    max_price = args.get('max_price', '').strip()
+    if max_price:
+        centavos = preco_em_centavos(max_price)
+        if centavos is None:
+            raise ValueError('max_price deve ser um valor em reais')
+        consulta = consulta.filter(Plano.preco_centavos <= centavos)
+
+    sort = args.get('sort', '').strip()
+    if sort:
+        if sort not in ORDENACOES:
+            raise ValueError(f"sort deve ser um de: {', '.join(ORDENACOES)}")
+        campo, decrescente = ORDENACOES[sort]
+        coluna = getattr(Plano, campo)
+        # Planos sem valor convertido ficam por último nas duas direções
+        consulta = consulta.order_by(coluna.is_(None), coluna.desc() if decrescente else coluna)
+    return consulta.order_by(Plano.ordem_exibicao, Plano.id)
+
 @app.route('/planos')
+@cache_resposta(cache_paginas, tags=['configs', 'planos'], ignorar=cache_desativado,
+                parametros=PARAMETROS_FILTRO_PLANOS)
 def planos():
     try:
-        planos_data = Plano.query.filter_by(ativo=True).order_by(Plano.ordem_exibicao).all()
+        consulta = consultar_planos(request.args)
+    except ValueError as e:
+        abort(400, description=str(e))
+    try:
+        planos_data = consulta.all()
         planos_formatados = []
         for plano in planos_data:
             planos_formatados.append({
@@ -396,23 +774,37 @@ def planos():
                 'recomendado': plano.recomendado
             })
         return render_template('public/planos.html', planos=planos_formatados, configs=get_configs())
-    except Exception as e:
-        print(f"Erro na rota /planos: {e}")
+    except Exception:
+        logger.exception('Erro na rota /planos')
+        g.sem_cache = True
         return render_template('public/planos.html', planos=[], configs=get_configs())
 
 @app.route('/blog')
-def blog():
+@app.route('/blog/pagina/<int:pagina>')
+@cache_resposta(cache_paginas, tags=['configs', 'blog'], ignorar=cache_desativado)
+def blog(pagina=1):
     try:
-        posts = Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).all()
-        return render_template('public/blog.html', configs=get_configs(), posts=posts)
+        paginacao = Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).paginate(
+            page=pagina, per_page=BLOG_POSTS_POR_PAGINA, error_out=False
+        )
+        if pagina > 1 and not paginacao.items:
+            abort(404)
+        return render_template('public/blog.html', configs=get_configs(), posts=paginacao.items, paginacao=paginacao)
+    except HTTPException:
+        raise
     except Exception:
-        return render_template('public/blog.html', configs=get_configs(), posts=[])
+        g.sem_cache = True
+        return render_template('public/blog.html', configs=get_configs(), posts=[], paginacao=None)
 
 @app.route('/velocimetro')
+@cache_resposta(cache_paginas, tags=['configs'], ignorar=cache_desativado)
 def velocimetro():
-    return render_template('public/velocimetro.html', configs=get_configs())
+    configs = get_configs()
+    localidades = extrair_localidades(configs.get('endereco', ''))
+    return render_template('public/velocimetro.html', configs=configs, localidades=localidades)
 
 @app.route('/sobre')
+@cache_resposta(cache_paginas, tags=['configs'], ignorar=cache_desativado)
 def sobre():
     return render_template('public/sobre.html', configs=get_configs())
 
@@ -439,15 +831,19 @@ def admin_login():
             try:
                 if user.check_password(password):
                     login_user(user, remember=False)
+                    logger_auditoria.info('Login administrativo', extra={'evento': 'login', 'usuario': username})
                     flash('Login realizado com sucesso!', 'success')
                     return redirect(url_for('admin_planos'))
                 else:
+                    logger_auditoria.warning('Falha de login', extra={'evento': 'login_falhou', 'usuario': username})
                     flash('Usuário ou senha inválidos.', 'error')
             except ValueError as e:
+                logger_auditoria.warning('Falha de login', extra={'evento': 'login_falhou', 'usuario': username, 'motivo': str(e)})
                 flash(str(e), 'error')
         else:
             # Timing constante para evitar timing attacks
             check_password_hash(generate_password_hash('dummy'), 'dummy_password')
+            logger_auditoria.warning('Falha de login', extra={'evento': 'login_falhou', 'usuario': username})
             flash('Usuário ou senha inválidos.', 'error')
     
     return render_template('auth/login.html')
@@ -455,6 +851,7 @@ def admin_login():
 @app.route(f'{ADMIN_URL_PREFIX}/logout')
 @login_required
 def admin_logout():
+    logger_auditoria.info('Logout administrativo', extra={'evento': 'logout', 'usuario': current_user.username})
     logout_user()
     flash('Você saiu da sua conta.', 'info')
     return redirect(url_for('admin_login'))
@@ -480,12 +877,9 @@ def adicionar_post():
             link_materia = request.form.get('link_materia', '').strip()
             data_publicacao_str = request.form.get('data_publicacao', '')
             
-            if not all([titulo, conteudo_bruto, categoria, link_materia]):
-                flash('Todos os campos obrigatórios devem ser preenchidos.', 'error')
-                return redirect(request.url)
-            
-            if not validate_url(link_materia):
-                flash('URL da matéria inválida.', 'error')
+            erro = validar_post(titulo, conteudo_bruto, categoria, link_materia)
+            if erro:
+                flash(erro, 'error')
                 return redirect(request.url)
             
             imagem_filename = 'default.jpg'
@@ -502,10 +896,7 @@ def adicionar_post():
                 data_publicacao = datetime.utcnow()
                 flash('Data inválida. Usando data atual.', 'warning')
             
-            # Criar resumo
-            conteudo_limpo = re.sub(r'<[^>]+>', '', conteudo_bruto)
-            conteudo_limpo = re.sub(r'\*\*.*?\*\*', '', conteudo_limpo)
-            resumo = conteudo_limpo[:150] + '...' if len(conteudo_limpo) > 150 else conteudo_limpo
+            resumo = gerar_resumo(conteudo_bruto)
             
             novo_post = Post(
                 titulo=bleach.clean(titulo),
@@ -516,9 +907,11 @@ def adicionar_post():
                 link_materia=link_materia,
                 data_publicacao=data_publicacao
             )
+            novo_post.renderizar_conteudo()
             
             db.session.add(novo_post)
             db.session.commit()
+            conteudo_alterado('blog')
             
             flash(f'Post "{novo_post.titulo}" adicionado com sucesso!', 'success')
             return redirect(url_for('admin_blog'))
@@ -537,13 +930,13 @@ def editar_post(post_id):
     
     if request.method == 'POST':
         try:
+            imagem_antiga = None
             if 'imagem' in request.files:
                 file = request.files['imagem']
                 if file and file.filename != '':
                     uploaded_filename = save_uploaded_file(file)
                     if uploaded_filename:
-                        if post.imagem and post.imagem != 'default.jpg':
-                            delete_uploaded_file(post.imagem)
+                        imagem_antiga = post.imagem
                         post.imagem = uploaded_filename
             
             data_publicacao_str = request.form.get('data_publicacao', '')
@@ -554,12 +947,11 @@ def editar_post(post_id):
                 flash('Data inválida. Mantendo data original.', 'warning')
             
             conteudo_bruto = request.form.get('conteudo', '').strip()
-            conteudo_limpo = re.sub(r'<[^>]+>', '', conteudo_bruto)
-            conteudo_limpo = re.sub(r'\*\*.*?\*\*', '', conteudo_limpo)
-            resumo = conteudo_limpo[:150] + '...' if len(conteudo_limpo) > 150 else conteudo_limpo
+            resumo = gerar_resumo(conteudo_bruto)
             
             post.titulo = bleach.clean(request.form.get('titulo', '').strip())
             post.conteudo = conteudo_bruto
+            post.renderizar_conteudo()
             post.resumo = bleach.clean(resumo)
             post.categoria = bleach.clean(request.form.get('categoria', ''))
             post.link_materia = request.form.get('link_materia', '').strip()
@@ -567,6 +959,9 @@ def editar_post(post_id):
             post.updated_at = datetime.utcnow()
             
             db.session.commit()
+            if imagem_antiga and imagem_antiga != 'default.jpg':
+                executor_tarefas.enfileirar('remover_arquivo', filename=imagem_antiga)
+            conteudo_alterado('blog')
             flash('Post atualizado com sucesso!', 'success')
             return redirect(url_for('admin_blog'))
             
@@ -582,11 +977,11 @@ def editar_post(post_id):
 def excluir_post(post_id):
     try:
         post = Post.query.get_or_404(post_id)
-        if post.imagem and post.imagem != 'default.jpg':
-            delete_uploaded_file(post.imagem)
-        
         post.ativo = False
         db.session.commit()
+        if post.imagem and post.imagem != 'default.jpg':
+            executor_tarefas.enfileirar('remover_arquivo', filename=post.imagem)
+        conteudo_alterado('blog')
         flash(f'Post "{post.titulo}" excluído com sucesso!', 'success')
     except Exception:
         db.session.rollback()
@@ -616,8 +1011,10 @@ def adicionar_plano():
                 velocidade=bleach.clean(request.form.get('velocidade', '')),
                 recomendado='recomendado' in request.form
             )
+            novo_plano.atualizar_valores_numericos()
             db.session.add(novo_plano)
             db.session.commit()
+            conteudo_alterado('planos')
             flash(f'Plano "{novo_plano.nome}" adicionado com sucesso!', 'success')
             return redirect(url_for('admin_planos'))
         except Exception:
@@ -638,8 +1035,10 @@ def editar_plano(plano_id):
             plano.features = bleach.clean(request.form['features'])
             plano.velocidade = bleach.clean(request.form.get('velocidade', ''))
             plano.recomendado = 'recomendado' in request.form
+            plano.atualizar_valores_numericos()
             
             db.session.commit()
+            conteudo_alterado('planos')
             flash('Plano atualizado com sucesso!', 'success')
             return redirect(url_for('admin_planos'))
         except Exception:
@@ -655,6 +1054,7 @@ def excluir_plano(plano_id):
         plano = Plano.query.get_or_404(plano_id)
         plano.ativo = False
         db.session.commit()
+        conteudo_alterado('planos')
         flash(f'Plano "{plano.nome}" excluído com sucesso!', 'success')
     except Exception:
         db.session.rollback()
@@ -676,6 +1076,7 @@ def admin_configuracoes():
                         config = Configuracao(chave=chave, valor=bleach.clean(valor.strip()))
                         db.session.add(config)
             db.session.commit()
+            conteudo_alterado('tudo')
             flash('Configurações atualizadas com sucesso!', 'success')
         except Exception:
             db.session.rollback()
@@ -684,27 +1085,64 @@ def admin_configuracoes():
     configs = get_configs()
     return render_template('admin/configuracoes.html', configs=configs)
 
+@app.route(f'{ADMIN_URL_PREFIX}/cache')
+@login_required
+def admin_cache():
+    return jsonify({
+        'status': gerenciador_cache.status(),
+        'namespaces': gerenciador_cache.estatisticas(),
+        'replica': roteador_replica.status(),
+        'logs': handler_logs.status(),
+        'inicializacao': metricas_inicializacao
+    })
+
+@app.route(f'{ADMIN_URL_PREFIX}/limites')
+@login_required
+def admin_limites():
+    """Contadores de requisições admitidas e rejeitadas deste worker"""
+    return jsonify(limitador_api.estatisticas())
+
 # ========================================
 # UTILITÁRIOS
 # ========================================
 
 def get_configs():
-    """Retorna configurações sanitizadas"""
+    """Retorna configurações sanitizadas (em cache até a próxima alteração)"""
+    encontrado, configs = cache_configs.obter('todas')
+    if encontrado:
+        return dict(configs)
     try:
         configuracoes_db = Configuracao.query.all()
         configs = {}
         for config in configuracoes_db:
             configs[config.chave] = bleach.clean(config.valor)
-        return configs
+        cache_configs.gravar('todas', configs, tags=['configs'])
+        return dict(configs)
     except Exception:
         return {
             'SITE_NAME': 'NetFyber',
             'SITE_DESCRIPTION': 'Plataforma de Testes de Velocidade'
         }
 
+@app.template_global()
+def fragmento(nome, configs):
+    """Renderiza um parcial que depende apenas de `configs`, com cache por versão"""
+    configs = configs or {}
+
+    def renderizar():
+        return Markup(render_template(nome, configs=configs))
+
+    if app.debug:
+        return renderizar()
+    return cache_fragmentos.obter_ou_calcular(f'{nome}:{versao_configs(configs)}', renderizar)
+
 @app.route('/api/planos')
+@cache_resposta(cache_api, tags=['planos'], ignorar=cache_desativado, parametros=PARAMETROS_FILTRO_PLANOS)
 def api_planos():
-    planos_data = Plano.query.filter_by(ativo=True).order_by(Plano.ordem_exibicao).all()
+    try:
+        planos_data = consultar_planos(request.args).all()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     planos_list = []
     for plano in planos_data:
         planos_list.append({
@@ -712,12 +1150,15 @@ def api_planos():
             'nome': plano.nome,
             'preco': plano.preco,
             'velocidade': plano.velocidade,
+            'preco_centavos': plano.preco_centavos,
+            'velocidade_mbps': plano.velocidade_mbps,
             'features': plano.get_features_list(),
             'recomendado': plano.recomendado
         })
     return jsonify(planos_list)
 
 @app.route('/api/blog/posts')
+@cache_resposta(cache_api, tags=['blog'], ignorar=cache_desativado)
 def api_blog_posts():
     try:
         posts = Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).all()
@@ -735,16 +1176,679 @@ def api_blog_posts():
             })
         return jsonify(posts_list)
     except Exception:
+        g.sem_cache = True
         return jsonify([])
 
+# ========================================
+# VELOCÍMETRO - LATÊNCIA E RESULTADOS
+# ========================================
+
+def gravar_lote_velocimetro(lote):
+    """Grava um lote de resultados em uma única transação"""
+    with app.app_context():
+        try:
+            db.session.bulk_insert_mappings(ResultadoVelocimetro, lote)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+CAMPOS_ESTATISTICAS = ('plano_id', 'localidade') + METRICAS
+CHAVE_ESTATISTICAS_VELOCIMETRO = 'velocimetro:estatisticas'
+
+def atualizar_estatisticas_velocimetro():
+    """
+    Percentis por plano/localidade a partir dos resultados gravados (mais
+    recentes primeiro, até o limite de linhas), guardados no cache
+    compartilhado. Roda na thread do buffer, nunca na requisição.
+    """
+    with app.app_context():
+        limite = datetime.utcnow() - timedelta(days=VELOCIMETRO_JANELA_DIAS)
+        colunas = [getattr(ResultadoVelocimetro, campo) for campo in CAMPOS_ESTATISTICAS]
+        linhas = (
+            db.session.query(*colunas)
+            .filter(ResultadoVelocimetro.created_at >= limite)
+            .order_by(ResultadoVelocimetro.id.desc())
+            .limit(VELOCIMETRO_MAX_LINHAS_ESTATISTICAS)
+            .all()
+        )
+        # Do mais antigo para o mais recente: a janela de cada grupo fica com os últimos resultados
+        grupos = resumir_latencias([dict(zip(CAMPOS_ESTATISTICAS, linha)) for linha in reversed(linhas)])
+        cache_api.gravar(CHAVE_ESTATISTICAS_VELOCIMETRO, grupos, ttl=VELOCIMETRO_TTL_ESTATISTICAS)
+
+buffer_velocimetro = BufferResultados(
+    gravar_lote_velocimetro,
+    tamanho_lote=VELOCIMETRO_TAMANHO_LOTE,
+    intervalo=VELOCIMETRO_INTERVALO_LOTE,
+    max_pendentes=VELOCIMETRO_MAX_PENDENTES,
+    ao_gravar=atualizar_estatisticas_velocimetro
+)
+
+def get_localidades():
+    """Localidades atendidas, extraídas da configuração de endereço"""
+    return extrair_localidades(get_configs().get('endereco', ''))
+
+def ids_planos_ativos():
+    """Ids dos planos ativos (em cache até a próxima alteração de planos)"""
+    return cache_api.obter_ou_calcular(
+        'ids_planos_ativos',
+        lambda: frozenset(id_ for id_, in db.session.query(Plano.id).filter_by(ativo=True)),
+        tags=['planos']
+    )
+
+def _numero_opcional(valor, maximo):
+    """Converte um valor numérico opcional do JSON, rejeitando valores inválidos"""
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError
+    if valor < 0 or valor > maximo:
+        raise ValueError
+    return float(valor)
+
+@app.route('/api/velocimetro/ping', methods=['GET', 'HEAD'])
+def api_velocimetro_ping():
+    """Eco sem corpo para amostragem repetida de RTT"""
+    response = app.response_class(status=204)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/velocimetro/resultados', methods=['POST'])
+def api_velocimetro_resultados():
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        return jsonify({'erro': 'JSON inválido'}), 400
+
+    amostras = dados.get('amostras_ms')
+    if not isinstance(amostras, list) or len(amostras) > VELOCIMETRO_MAX_AMOSTRAS:
+        return jsonify({'erro': 'Amostras inválidas'}), 400
+
+    latencia = calcular_latencia(amostras)
+    if latencia is None:
+        return jsonify({'erro': 'Amostras inválidas'}), 400
+
+    try:
+        download = _numero_opcional(dados.get('download_mbps'), 100000)
+        upload = _numero_opcional(dados.get('upload_mbps'), 100000)
+        plano_id = dados.get('plano_id')
+        if plano_id is not None and (isinstance(plano_id, bool) or not isinstance(plano_id, int)):
+            raise ValueError
+    except ValueError:
+        return jsonify({'erro': 'Valores inválidos'}), 400
+
+    # Id desconhecido não pode entrar no lote (chave estrangeira) nem nas estatísticas
+    if plano_id is not None and plano_id not in ids_planos_ativos():
+        plano_id = None
+
+    localidade = dados.get('localidade')
+    if localidade not in get_localidades():
+        localidade = LOCALIDADE_PADRAO
+
+    resultado = dict(
+        latencia,
+        plano_id=plano_id,
+        localidade=localidade,
+        download_mbps=download,
+        upload_mbps=upload,
+        created_at=datetime.utcnow()
+    )
+
+    if not buffer_velocimetro.adicionar(resultado):
+        response = jsonify({'erro': 'Serviço temporariamente sobrecarregado'})
+        response.headers['Retry-After'] = str(int(VELOCIMETRO_INTERVALO_LOTE) + 1)
+        return response, 503
+
+    return jsonify(latencia), 202
+
+@app.route('/api/velocimetro/estatisticas')
+def api_velocimetro_estatisticas():
+    plano_id = request.args.get('plano_id', type=int)
+    localidade = request.args.get('localidade')
+    encontrado, grupos = cache_api.obter(CHAVE_ESTATISTICAS_VELOCIMETRO)
+    if not encontrado:
+        # Resumo expirado (sem resultados novos): a thread do buffer recalcula
+        buffer_velocimetro.solicitar_ao_gravar()
+    return jsonify({
+        'localidades': get_localidades(),
+        'grupos': filtrar_grupos(grupos or [], plano_id, localidade),
+        'atualizando': not encontrado,
+    })
+
 @app.route('/health')
+@app.route('/health/live')
 def health_check():
+    """Liveness: o processo responde. Não acessa dependências."""
     return jsonify({
         'status': 'healthy', 
         'timestamp': datetime.utcnow().isoformat(),
         'version': '1.0.0'
     })
 
+# ========================================
+# PRONTIDÃO (READINESS)
+# ========================================
+
+def verificar_banco():
+    inicio = time.perf_counter()
+    with db.engine.connect() as conexao:
+        conexao.execute(text('SELECT 1'))
+    latencia = (time.perf_counter() - inicio) * 1000
+    return {'ok': latencia <= PRONTIDAO_MAX_LATENCIA_BANCO_MS, 'latencia_ms': round(latencia, 2)}
+
+def verificar_pool():
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'ok': True, 'tipo': type(pool).__name__}
+    tamanho = pool.size()
+    em_uso = pool.checkedout()
+    max_overflow = getattr(pool, '_max_overflow', 0)
+    capacidade = tamanho + max_overflow if max_overflow >= 0 else None
+    saturacao = em_uso / capacidade if capacidade else 0.0
+    return {
+        'ok': saturacao < PRONTIDAO_MAX_SATURACAO_POOL,
+        'tipo': type(pool).__name__,
+        'em_uso': em_uso,
+        'capacidade': capacidade,
+        'saturacao': round(saturacao, 3),
+    }
+
+def verificar_cache():
+    return gerenciador_cache.status()
+
+def verificar_uploads():
+    pasta = app.config['UPLOAD_FOLDER']
+    with tempfile.NamedTemporaryFile(dir=pasta, prefix='.prontidao-'):
+        pass
+    return {'ok': True, 'pasta': pasta}
+
+# Banco e pool indisponíveis tiram a instância do balanceamento; cache e uploads apenas degradam
+verificador_prontidao = VerificadorProntidao(
+    app,
+    {
+        'pool': verificar_pool,
+        'banco': verificar_banco,
+        'cache': verificar_cache,
+        'uploads': verificar_uploads,
+    },
+    criticas=('banco', 'pool'),
+    intervalo=PRONTIDAO_INTERVALO
+)
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness: último resultado das verificações em segundo plano (custo ~zero por chamada)"""
+    resultado = verificador_prontidao.resultado()
+    resposta = jsonify(dict(resultado, timestamp=datetime.utcnow().isoformat()))
+    resposta.status_code = 503 if resultado['status'] == INDISPONIVEL else 200
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
+# ========================================
+# EXPORTAÇÃO ESTÁTICA
+# ========================================
+
+def urls_blog():
+    total = Post.query.filter_by(ativo=True).count()
+    paginas = max(1, -(-total // BLOG_POSTS_POR_PAGINA))
+    return ['/blog'] + [f'/blog/pagina/{n}' for n in range(2, paginas + 1)]
+
+def urls_publicas(grupo='tudo'):
+    """URLs públicas exportadas, agrupadas pelo conteúdo de que dependem"""
+    grupos = {
+        'planos': lambda: ['/planos', '/api/planos'],
+        'blog': lambda: urls_blog() + ['/api/blog/posts'],
+    }
+    if grupo in grupos:
+        return grupos[grupo]()
+    # Configurações aparecem no layout de todas as páginas
+    return ['/', '/sobre'] + grupos['planos']() + grupos['blog']()
+
+# O velocímetro mede a latência até o servidor: página e APIs continuam dinâmicas
+ROTAS_DINAMICAS = ['/velocimetro', '/api/velocimetro/*']
+
+exportador_estatico = ExportadorEstatico(
+    app,
+    EXPORTACAO_ESTATICA_DIR or 'estatico',
+    urls_publicas,
+    pastas_sem_hash=['uploads/'],
+    rotas_dinamicas=ROTAS_DINAMICAS,
+    origem=EXPORTACAO_ORIGEM_URL
+)
+
+# Tags de cache afetadas por cada grupo de conteúdo
+TAGS_POR_GRUPO = {
+    'planos': ['planos'],
+    'blog': ['blog'],
+    'tudo': ['configs', 'planos', 'blog'],
+}
+
+def conteudo_alterado(grupo):
+    """Chamado após escritas do admin: invalida caches e agenda a reconstrução estática"""
+    logger_auditoria.info('Conteúdo alterado', extra={
+        'evento': 'conteudo_alterado',
+        'grupo': grupo,
+        'usuario': current_user.username if has_request_context() and current_user.is_authenticated else None,
+    })
+    roteador_replica.fixar_primario()
+    gerenciador_cache.invalidar_tags(*TAGS_POR_GRUPO.get(grupo, TAGS_POR_GRUPO['tudo']))
+    reconstruir_estatico(grupo)
+
+def reconstruir_estatico(grupo):
+    """Agenda a reconstrução em segundo plano das páginas afetadas por uma escrita"""
+    if not EXPORTACAO_ESTATICA_DIR:
+        return
+    try:
+        executor_tarefas.enfileirar('reconstruir_estatico', unica=True, grupo=grupo)
+    except Exception:
+        logger.exception('Erro ao agendar reconstrução estática')
+
+# ========================================
+# TAREFAS EM SEGUNDO PLANO
+# ========================================
+
+executor_tarefas = ExecutorTarefas(
+    app, db, Tarefa,
+    trabalhadores=TAREFAS_TRABALHADORES,
+    tamanho_fila=TAREFAS_TAMANHO_FILA,
+    max_tentativas=TAREFAS_MAX_TENTATIVAS
+)
+
+@executor_tarefas.tarefa('remover_arquivo')
+def tarefa_remover_arquivo(filename):
+    delete_uploaded_file(filename)
+
+@executor_tarefas.tarefa('reconstruir_estatico')
+def tarefa_reconstruir_estatico(grupo):
+    if not exportador_estatico.manifesto:
+        exportador_estatico.carregar_manifesto()
+    urls = urls_publicas(grupo)
+    falhas = exportador_estatico.renderizar(urls)
+    if falhas:
+        raise RuntimeError(f"Falha ao reconstruir: {falhas}")
+    if grupo in ('blog', 'tudo'):
+        # Imagens novas dos posts e páginas além da última após exclusões
+        exportador_estatico.sincronizar_pasta('uploads')
+        exportador_estatico.remover_obsoletas(urls, prefixos=['/blog/pagina/'])
+
+@app.route(f'{ADMIN_URL_PREFIX}/tarefas')
+@login_required
+def admin_tarefas():
+    tarefas = Tarefa.query.order_by(Tarefa.id.desc()).limit(50).all()
+    return render_template('admin/tarefas.html', tarefas=tarefas, resumo=executor_tarefas.resumo())
+
+@app.cli.command('congelar')
+@click.option('--destino', default=None, help='Diretório de saída (padrão: EXPORTACAO_ESTATICA_DIR ou ./estatico)')
+@click.option('--limpar', is_flag=True, help='Remove o diretório de saída antes de exportar')
+def congelar_command(destino, limpar):
+    """Pré-renderiza o site público para hospedagem estática"""
+    if destino:
+        exportador_estatico.destino = destino
+    urls, falhas = exportador_estatico.congelar(limpar=limpar)
+    for url, status in falhas:
+        click.echo(f"❌ {url}: HTTP {status}")
+    if not EXPORTACAO_ORIGEM_URL:
+        click.echo(f"⚠️ Rotas dinâmicas não exportadas ({', '.join(ROTAS_DINAMICAS)}): "
+                   f"defina EXPORTACAO_ORIGEM_URL para encaminhá-las ao Flask no _redirects")
+    click.echo(f"✅ {len(urls) - len(falhas)} de {len(urls)} páginas exportadas para {exportador_estatico.destino}")
+
+# ========================================
+# MANUTENÇÃO (flask manutencao ...)
+# ========================================
+
+checkpoints_manutencao = CheckpointsManutencao(db, CheckpointManutencao)
+
+FEATURES_PADRAO = "Wi-Fi Grátis\nInstalação Grátis\nSuporte 24h"
+FEATURES_POR_VELOCIDADE = {
+    '100': FEATURES_PADRAO + "\nFibra Óptica",
+    '200': FEATURES_PADRAO + "\nFibra Óptica\nModem Incluso",
+    '400': FEATURES_PADRAO + "\nFibra Óptica\nModem Incluso\nAntivírus",
+}
+
+def velocidade_legada_no_nome(nome):
+    """Faixa (100/200/400) no nome, como o antigo repair_planos.py: 'Fibra 100' -> '100'"""
+    return next((v for v in FEATURES_POR_VELOCIDADE if re.search(rf'(?<!\d){v}(?!\d)', nome or '')), None)
+
+def reparar_plano(plano):
+    """
+    Corrige features vazias, preço com sufixo ('/mês') e velocidade ausente.
+    As features seguem velocidade_mbps (da velocidade ou do nome com unidade)
+    e, sem ela, a faixa 100/200/400 presente no nome; a velocidade vazia só é
+    preenchida com essa faixa.
+    """
+    plano.atualizar_valores_numericos()
+    faixa_no_nome = velocidade_legada_no_nome(plano.nome)
+    faixa = str(plano.velocidade_mbps) if plano.velocidade_mbps else None
+    if faixa not in FEATURES_POR_VELOCIDADE:
+        faixa = faixa_no_nome
+
+    if not plano.features or len(plano.features.strip()) < 5:
+        plano.features = FEATURES_POR_VELOCIDADE.get(faixa, FEATURES_PADRAO)
+
+    if '/' in str(plano.preco):
+        plano.preco = str(plano.preco).split('/')[0].strip()
+
+    if (not plano.velocidade or plano.velocidade.strip() == '') and faixa_no_nome:
+        plano.velocidade = f'{faixa_no_nome} Mbps'
+
+    plano.atualizar_valores_numericos()
+
+def opcoes_lote(funcao):
+    """Opções comuns dos comandos de manutenção em lotes"""
+    funcao = click.option('--dry-run', is_flag=True, help='Calcula as alterações sem gravar')(funcao)
+    funcao = click.option('--lote', default=500, show_default=True, help='Registros por lote/commit')(funcao)
+    funcao = click.option('--reiniciar', is_flag=True, help='Ignora o checkpoint e começa do início')(funcao)
+    return funcao
+
+@app.cli.group('manutencao')
+def manutencao_cli():
+    """Tarefas de manutenção em lotes, retomáveis"""
+
+@manutencao_cli.command('migrar')
+def migrar_command():
+    """Cria tabelas, colunas e índices ausentes (também roda na inicialização)"""
+    migrar_esquema()
+    click.echo("✅ Esquema atualizado")
+
+@manutencao_cli.command('reparar-planos')
+@opcoes_lote
+def reparar_planos_command(dry_run, lote, reiniciar):
+    """
+    Corrige features, preço e velocidade dos planos e recalcula os valores
+    numéricos. Velocidade vazia só é preenchida quando o nome traz a faixa
+    100, 200 ou 400; outros números no nome não são usados.
+    """
+    relatorio = executar_em_lotes(
+        db, Plano, reparar_plano, ['features', 'preco', 'velocidade', 'preco_centavos', 'velocidade_mbps'],
+        'reparar-planos',
+        checkpoints_manutencao, tamanho_lote=lote, dry_run=dry_run, reiniciar=reiniciar, eco=click.echo
+    )
+    click.echo(relatorio.resumo())
+    if not dry_run and relatorio.alteradas:
+        conteudo_alterado('planos')
+
+@manutencao_cli.command('preencher-valores-planos')
+@opcoes_lote
+def preencher_valores_planos_command(dry_run, lote, reiniciar):
+    """Preenche preco_centavos e velocidade_mbps a partir dos textos dos planos"""
+    relatorio = executar_em_lotes(
+        db, Plano, Plano.atualizar_valores_numericos, ['preco_centavos', 'velocidade_mbps'],
+        'preencher-valores-planos', checkpoints_manutencao,
+        tamanho_lote=lote, dry_run=dry_run, reiniciar=reiniciar, eco=click.echo
+    )
+    click.echo(relatorio.resumo())
+    if not dry_run and relatorio.alteradas:
+        conteudo_alterado('planos')
+
+@manutencao_cli.command('rerenderizar-posts')
+@opcoes_lote
+def rerenderizar_posts_command(dry_run, lote, reiniciar):
+    """Regera o HTML sanitizado guardado dos posts"""
+    relatorio = executar_em_lotes(
+        db, Post, Post.renderizar_conteudo, ['conteudo_html'], 'rerenderizar-posts',
+        checkpoints_manutencao, tamanho_lote=lote, dry_run=dry_run, reiniciar=reiniciar, eco=click.echo
+    )
+    click.echo(relatorio.resumo())
+    if not dry_run and relatorio.alteradas:
+        conteudo_alterado('blog')
+
+@manutencao_cli.command('limpar-uploads')
+@click.option('--dry-run', is_flag=True, help='Lista os arquivos sem remover')
+@click.option('--lote', default=1000, show_default=True, help='Posts lidos por consulta')
+@click.option('--idade-minima', default=3600, show_default=True, help='Segundos desde a última modificação')
+def limpar_uploads_command(dry_run, lote, idade_minima):
+    """Remove arquivos de upload que nenhum post referencia"""
+    inicio = time.perf_counter()
+    referenciados = set()
+    ultimo_id = 0
+    while True:
+        linhas = db.session.query(Post.id, Post.imagem).filter(Post.id > ultimo_id).order_by(Post.id).limit(lote).yield_per(lote).all()
+        if not linhas:
+            break
+        referenciados.update(secure_filename(imagem) for _, imagem in linhas if imagem)
+        ultimo_id = linhas[-1][0]
+
+    pasta = app.config['UPLOAD_FOLDER']
+    limite = time.time() - idade_minima
+    analisados = removidos = bytes_liberados = 0
+    with os.scandir(pasta) if os.path.isdir(pasta) else nullcontext([]) as entradas:
+        for entrada in entradas:
+            if not entrada.is_file():
+                continue
+            analisados += 1
+            info = entrada.stat()
+            if entrada.name in referenciados or info.st_mtime > limite:
+                continue
+            removidos += 1
+            bytes_liberados += info.st_size
+            click.echo(f"   {'(dry-run) ' if dry_run else ''}removendo {entrada.name}")
+            if not dry_run:
+                os.remove(entrada.path)
+
+    decorrido = time.perf_counter() - inicio
+    click.echo(
+        f"📊 limpar-uploads: {len(referenciados)} imagens referenciadas, {analisados} arquivos analisados, "
+        f"{removidos} órfãos ({bytes_liberados / 1024:.0f} KB) em {decorrido:.2f}s"
+    )
+
+# ========================================
+# IMPORTAÇÃO / EXPORTAÇÃO (flask dados ...)
+# ========================================
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+def preparar_post_importacao(registro):
+    """Valida e sanitiza um post com as mesmas regras do formulário"""
+    titulo = _texto(registro, 'titulo')
+    conteudo = _texto(registro, 'conteudo')
+    categoria = _texto(registro, 'categoria')
+    link_materia = _texto(registro, 'link_materia')
+    erro = validar_post(titulo, conteudo, categoria, link_materia)
+    if erro:
+        raise ValueError(erro)
+
+    agora = datetime.utcnow()
+    return {
+        'id': identificador(registro.get('id')),
+        'titulo': bleach.clean(titulo),
+        'conteudo': conteudo,
+        'conteudo_html': sanitize_html(conteudo),
+        'resumo': bleach.clean(_texto(registro, 'resumo') or gerar_resumo(conteudo)),
+        'categoria': bleach.clean(categoria),
+        'imagem': secure_filename(_texto(registro, 'imagem')) or 'default.jpg',
+        'link_materia': link_materia,
+        'data_publicacao': data_hora(registro.get('data_publicacao')) or agora,
+        'ativo': booleano(registro.get('ativo'), padrao=True),
+        'created_at': agora,
+        'updated_at': agora,
+    }
+
+def preparar_plano_importacao(registro):
+    """Valida e sanitiza um plano com as mesmas regras do formulário"""
+    nome = _texto(registro, 'nome')
+    preco = _texto(registro, 'preco')
+    features = _texto(registro, 'features')
+    if not all([nome, preco, features]):
+        raise ValueError('Campos obrigatórios: nome, preco, features')
+
+    velocidade = bleach.clean(_texto(registro, 'velocidade'))
+    return {
+        'id': identificador(registro.get('id')),
+        'nome': bleach.clean(nome),
+        'preco': bleach.clean(preco),
+        'preco_centavos': preco_em_centavos(preco),
+        'features': bleach.clean(features),
+        'velocidade': velocidade,
+        'velocidade_mbps': velocidade_em_mbps(velocidade) or velocidade_em_mbps(nome, exigir_unidade=True),
+        'recomendado': booleano(registro.get('recomendado')),
+        'ordem_exibicao': int(registro.get('ordem_exibicao') or 0),
+        'ativo': booleano(registro.get('ativo'), padrao=True),
+        'created_at': datetime.utcnow(),
+    }
+
+def preparar_configuracao_importacao(registro):
+    """Valida e sanitiza uma configuração com as mesmas regras do formulário"""
+    chave = _texto(registro, 'chave')
+    valor = _texto(registro, 'valor')
+    if not chave or not valor:
+        raise ValueError('Campos obrigatórios: chave, valor')
+
+    return {
+        'chave': bleach.clean(chave),
+        'valor': bleach.clean(valor),
+        'descricao': bleach.clean(_texto(registro, 'descricao')) or None,
+    }
+
+def gravar_configuracoes_em_lote(mapeamentos):
+    """Configurações são únicas por chave: atualiza as existentes e insere as novas"""
+    por_chave = {mapeamento['chave']: mapeamento for mapeamento in mapeamentos}
+    existentes = dict(
+        db.session.query(Configuracao.chave, Configuracao.id).filter(Configuracao.chave.in_(por_chave))
+    )
+    atualizar = [dict(mapeamento, id=existentes[chave]) for chave, mapeamento in por_chave.items() if chave in existentes]
+    inserir = [dict(mapeamento, created_at=datetime.utcnow()) for chave, mapeamento in por_chave.items() if chave not in existentes]
+    if atualizar:
+        db.session.bulk_update_mappings(Configuracao, atualizar)
+    if inserir:
+        db.session.bulk_insert_mappings(Configuracao, inserir)
+
+def gravar_por_id(modelo):
+    """
+    Registros com id já existente são atualizados (sem tocar em created_at);
+    os demais são inseridos mantendo o id exportado, para que reimportar uma
+    exportação não duplique nada. Registros sem id são sempre inseridos:
+    importar duas vezes um arquivo sem ids cria cópias.
+    """
+    def gravar(mapeamentos):
+        sem_id = [mapeamento for mapeamento in mapeamentos if mapeamento['id'] is None]
+        por_id = {mapeamento['id']: mapeamento for mapeamento in mapeamentos if mapeamento['id'] is not None}
+        existentes = {
+            id_existente for (id_existente,) in db.session.query(modelo.id).filter(modelo.id.in_(por_id))
+        } if por_id else set()
+
+        atualizar = [
+            {campo: valor for campo, valor in mapeamento.items() if campo != 'created_at'}
+            for id_registro, mapeamento in por_id.items() if id_registro in existentes
+        ]
+        inserir = [mapeamento for id_registro, mapeamento in por_id.items() if id_registro not in existentes]
+        inserir += [{campo: valor for campo, valor in mapeamento.items() if campo != 'id'} for mapeamento in sem_id]
+        if atualizar:
+            db.session.bulk_update_mappings(modelo, atualizar)
+        if inserir:
+            db.session.bulk_insert_mappings(modelo, inserir)
+        if len(inserir) > len(sem_id) and db.engine.dialect.name == 'postgresql':
+            # Ids explícitos não avançam a sequência; sem isto o próximo cadastro colidiria
+            tabela = modelo.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT MAX(id) FROM {tabela}))"
+            ))
+    return gravar
+
+MODELOS_DADOS = {
+    'posts': {
+        'modelo': Post,
+        'preparar': preparar_post_importacao,
+        'gravar': gravar_por_id(Post),
+        'grupo': 'blog',
+        'campos': ['id', 'titulo', 'conteudo', 'resumo', 'categoria', 'imagem',
+                   'link_materia', 'data_publicacao', 'ativo'],
+    },
+    'planos': {
+        'modelo': Plano,
+        'preparar': preparar_plano_importacao,
+        'gravar': gravar_por_id(Plano),
+        'grupo': 'planos',
+        'campos': ['id', 'nome', 'preco', 'velocidade', 'preco_centavos', 'velocidade_mbps',
+                   'features', 'recomendado', 'ordem_exibicao', 'ativo'],
+    },
+    'configuracoes': {
+        'modelo': Configuracao,
+        'preparar': preparar_configuracao_importacao,
+        'gravar': gravar_configuracoes_em_lote,
+        'grupo': 'tudo',
+        'campos': ['id', 'chave', 'valor', 'descricao'],
+    },
+}
+
+@app.cli.group('dados')
+def dados_cli():
+    """Importação e exportação em massa (JSONL/CSV)"""
+
+@dados_cli.command('importar')
+@click.argument('tipo', type=click.Choice(list(MODELOS_DADOS)))
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS), default=None, help='Padrão: pela extensão')
+@click.option('--lote', default=500, show_default=True, help='Registros por inserção/commit')
+@click.option('--dry-run', is_flag=True, help='Apenas valida, sem gravar')
+def importar_command(tipo, arquivo, formato, lote, dry_run):
+    """
+    Importa registros de um arquivo JSONL ou CSV.
+
+    Posts e planos com `id` existente são atualizados; sem `id`, são sempre
+    inseridos (importar o mesmo arquivo sem ids duas vezes duplica os
+    registros). Configurações são atualizadas pela `chave`.
+    """
+    definicao = MODELOS_DADOS[tipo]
+    formato = detectar_formato(arquivo, formato)
+    gravar = definicao['gravar']
+
+    inicio = time.perf_counter()
+    lidos = gravados = erros = 0
+    with open(arquivo, 'r', encoding='utf-8', newline='') as entrada:
+        for numero_lote, registros in enumerate(em_lotes(ler_registros(entrada, formato), lote), start=1):
+            mapeamentos = []
+            for numero, registro in registros:
+                lidos += 1
+                try:
+                    if isinstance(registro, Exception):
+                        raise registro
+                    mapeamentos.append(definicao['preparar'](registro))
+                except (ValueError, TypeError) as e:
+                    erros += 1
+                    if erros <= 20:
+                        click.echo(f"   ⚠️ linha {numero}: {e}")
+
+            if mapeamentos and not dry_run:
+                try:
+                    gravar(mapeamentos)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    click.echo(f"❌ Falha no lote {numero_lote}; {gravados} registros já gravados")
+                    raise
+                gravados += len(mapeamentos)
+
+            decorrido = time.perf_counter() - inicio
+            click.echo(f"   lote {numero_lote}: {lidos} lidos, {gravados} gravados, {erros} com erro "
+                       f"({lidos / decorrido if decorrido else 0:.0f} registros/s)")
+
+    click.echo(f"📊 importar {tipo}: {lidos} lidos, {gravados} gravados, {erros} com erro"
+               f"{' (dry-run)' if dry_run else ''}")
+    if gravados:
+        conteudo_alterado(definicao['grupo'])
+
+@dados_cli.command('exportar')
+@click.argument('tipo', type=click.Choice(list(MODELOS_DADOS)))
+@click.option('--saida', default='-', help='Arquivo de saída (padrão: stdout)')
+@click.option('--formato', type=click.Choice(FORMATOS), default=None, help='Padrão: pela extensão, ou jsonl')
+@click.option('--lote', default=1000, show_default=True, help='Linhas buscadas por vez no cursor')
+def exportar_command(tipo, saida, formato, lote):
+    """Exporta registros em fluxo (cursor no servidor) para JSONL ou CSV"""
+    definicao = MODELOS_DADOS[tipo]
+    modelo = definicao['modelo']
+    formato = formato or (detectar_formato(saida) if saida != '-' else 'jsonl')
+
+    colunas = [getattr(modelo, campo) for campo in definicao['campos']]
+    linhas = db.session.query(*colunas).order_by(modelo.id).yield_per(lote)
+
+    if saida == '-':
+        total = escrever_registros(sys.stdout, formato, definicao['campos'], linhas)
+    else:
+        with open(saida, 'w', encoding='utf-8', newline='') as arquivo:
+            total = escrever_registros(arquivo, formato, definicao['campos'], linhas)
+    click.echo(f"📊 exportar {tipo}: {total} registros", err=True)
+
 # ========================================
 # HANDLERS DE ERRO
 # ========================================
@@ -765,48 +1869,122 @@ def erro_servidor(error):
 # INICIALIZAÇÃO DO BANCO DE DADOS
 # ========================================
 
+# Chave do lock consultivo (PostgreSQL) que serializa as alterações de esquema entre processos
+CHAVE_LOCK_ESQUEMA = 7346201
+
+def garantir_colunas(conexao):
+    """
+    Adiciona colunas novas (anuláveis) e índices ausentes a tabelas existentes,
+    já que create_all não altera tabelas. Tolera o que outro processo já criou.
+    """
+    inspetor = inspect(conexao)
+    postgres = conexao.dialect.name == 'postgresql'
+    for tabela in db.metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes or not coluna.nullable:
+                continue
+            tipo = coluna.type.compile(dialect=conexao.dialect)
+            se_nao_existe = 'IF NOT EXISTS ' if postgres else ''
+            try:
+                conexao.execute(text(f'ALTER TABLE {tabela.name} ADD COLUMN {se_nao_existe}{coluna.name} {tipo}'))
+            except OperationalError as e:
+                # SQLite não tem ADD COLUMN IF NOT EXISTS
+                if 'duplicate column' not in str(e).lower():
+                    raise
+                continue
+            logger.info('Coluna adicionada', extra={'tabela': tabela.name, 'coluna': coluna.name})
+
+        # Índices declarados depois da criação da tabela
+        indices = {indice['name'] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name not in indices:
+                conexao.execute(CreateIndex(indice, if_not_exists=True))
+                logger.info('Índice criado', extra={'tabela': tabela.name, 'indice': indice.name})
+
+def migrar_esquema():
+    """
+    Cria tabelas, colunas e índices ausentes em uma única transação. No
+    PostgreSQL, um lock consultivo garante que só um worker altera o esquema
+    por vez; os demais esperam e encontram tudo criado.
+    """
+    with db.engine.begin() as conexao:
+        if conexao.dialect.name == 'postgresql':
+            conexao.execute(text('SELECT pg_advisory_xact_lock(:chave)'), {'chave': CHAVE_LOCK_ESQUEMA})
+        db.metadata.create_all(bind=conexao)
+        garantir_colunas(conexao)
+
+CONFIGS_PADRAO = {
+    'telefone_contato': '(63) 8494-1778',
+    'email_contato': 'contato@netfyber.com',
+    'endereco': 'AV. Tocantins – 934, Centro – Sítio Novo – TO<br>Axixá TO / Juverlândia / São Pedro / Folha Seca / Morada Nova / Santa Luzia / Boa Esperança',
+    'horario_segunda_sexta': '08h às 18h',
+    'horario_sabado': '08h às 13h',
+    'whatsapp_numero': '556384941778',
+    'instagram_url': 'https://www.instagram.com/netfybertelecom',
+    'facebook_url': '#',
+    'hero_imagem': 'images/familia.png',
+    'hero_titulo': 'Internet de Alta Velocidade',
+    'hero_subtitulo': 'Conecte sua família ao futuro com a NetFyber Telecom'
+}
+
 def init_database():
     """Inicializa o banco de dados automaticamente"""
-    try:
-        with app.app_context():
-            # Cria todas as tabelas
-            db.create_all()
-            print("✅ Tabelas criadas/verificadas com sucesso!")
-            
-            # Configurações padrão
-            configs_padrao = {
-                'telefone_contato': '(63) 8494-1778',
-                'email_contato': 'contato@netfyber.com',
-                'endereco': 'AV. Tocantins – 934, Centro – Sítio Novo – TO<br>Axixá TO / Juverlândia / São Pedro / Folha Seca / Morada Nova / Santa Luzia / Boa Esperança',
-                'horario_segunda_sexta': '08h às 18h',
-                'horario_sabado': '08h às 13h',
-                'whatsapp_numero': '556384941778',
-                'instagram_url': 'https://www.instagram.com/netfybertelecom',
-                'facebook_url': '#',
-                'hero_imagem': 'images/familia.png',
-                'hero_titulo': 'Internet de Alta Velocidade',
-                'hero_subtitulo': 'Conecte sua família ao futuro com a NetFyber Telecom'
-            }
-            
-            for chave, valor in configs_padrao.items():
-                if Configuracao.query.filter_by(chave=chave).first() is None:
-                    config = Configuracao(chave=chave, valor=valor)
-                    db.session.add(config)
-            
-            db.session.commit()
-            print("🎉 Banco de dados inicializado com sucesso!")
-            
-    except Exception as e:
-        print(f"⚠️ Erro ao inicializar banco de dados: {e}")
+    with app.app_context():
+        try:
+            migrar_esquema()
+            logger.info('Tabelas criadas/verificadas')
+        except Exception:
+            logger.exception('Erro ao migrar o esquema do banco')
+
+        # Configurações padrão (independente da migração; cada chave em sua transação,
+        # pois outro worker pode inseri-la ao mesmo tempo)
+        try:
+            for chave, valor in CONFIGS_PADRAO.items():
+                if Configuracao.query.filter_by(chave=chave).first() is not None:
+                    continue
+                db.session.add(Configuracao(chave=chave, valor=valor))
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+            logger.info('Banco de dados inicializado')
+        except Exception:
+            db.session.rollback()
+            logger.exception('Erro ao criar configurações padrão')
 
 # ========================================
 # INICIALIZAÇÃO DA APLICAÇÃO
 # ========================================
 
+# Tempos da inicialização deste worker (expostos no status do admin)
+metricas_inicializacao = {}
+
+def aquecer_templates():
+    """Compila todos os templates na inicialização do worker (usa o cache de bytecode)"""
+    inicio = time.perf_counter()
+    carregados = 0
+    for nome in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(nome)
+            carregados += 1
+        except Exception:
+            logger.exception('Erro ao compilar template', extra={'template': nome})
+    metricas_inicializacao['templates'] = carregados
+    metricas_inicializacao['aquecimento_ms'] = duracao_ms(inicio)
+    return carregados
+
 # Inicializa o banco de dados quando o aplicativo começar
 with app.app_context():
     init_database()
 
+# Sem --preload, cada worker do gunicorn importa este módulo: o aquecimento roda por worker
+aquecer_templates()
+metricas_inicializacao['inicializacao_ms'] = duracao_ms(INICIO_IMPORTACAO)
+logger.info('Worker inicializado', extra=metricas_inicializacao)
+
 if __name__ == '__main__':
     debug_mode = os.environ.get('FLASK_ENV') != 'production'
     app.run(host='0.0.0.0', port=5000, debug=debug_mode)
\ No newline at end of file
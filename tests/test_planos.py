@@ -0,0 +1,54 @@
+"""Conversão dos textos de preço e velocidade dos planos"""
+
+import pytest
+
+from utils.planos import preco_em_centavos, velocidade_em_mbps
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('100 Mbps', 100),
+    ('500MB', 500),
+    ('300 Mega', 300),
+    ('1 Giga', 1000),
+    ('1 Gbps', 1000),
+    ('1,5 Giga', 1500),
+    ('2.5 Gbps', 2500),
+    ('1.000 Mbps', 1000),
+    ('1.000 Mega', 1000),
+    ('1,000 Mbps', 1000),
+    ('1.000', 1000),
+    ('300', 300),
+    ('', None),
+    (None, None),
+    ('sem número', None),
+])
+def test_velocidade_em_mbps(texto, esperado):
+    assert velocidade_em_mbps(texto) == esperado
+
+
+@pytest.mark.parametrize('nome, esperado', [
+    ('Fibra 400 Mega', 400),
+    ('Ultra 300 Megas', 300),
+    ('Fibra 1 Giga', 1000),
+    ('Empresarial 1.000 Mbps', 1000),
+    ('Plano Família 2025', None),
+    ('Turbo 4G', None),
+    ('Fibra 100', None),
+    ('SoNoPrimario2', None),
+])
+def test_velocidade_no_nome_exige_unidade(nome, esperado):
+    assert velocidade_em_mbps(nome, exigir_unidade=True) == esperado
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('R$ 99,90', 9990),
+    ('R$ 99,90/mês', 9990),
+    ('1.299,90', 129990),
+    ('1,299.90', 129990),
+    ('99.90', 9990),
+    ('1.299', 129900),
+    ('', None),
+    (None, None),
+])
+def test_preco_em_centavos(texto, esperado):
+    assert preco_em_centavos(texto) == esperado
@@ -0,0 +1,74 @@
+"""
+Roteamento para a réplica com a réplica fora do ar: as leituras precisam
+cair no primário (e a requisição não pode travar).
+"""
+
+import threading
+
+import pytest
+from flask import Flask, g, jsonify, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from utils.replica import RoteadorReplica, criar_sessao_roteada
+
+
+@pytest.fixture
+def aplicacao(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primario.db'}"
+    app.config['SQLALCHEMY_BINDS'] = {'replica': f"sqlite:///{tmp_path / 'inexistente' / 'replica.db'}"}
+
+    roteador = None
+    db = SQLAlchemy(app, session_options={'class_': criar_sessao_roteada(lambda: roteador)})
+    roteador = RoteadorReplica(db, endpoints={'leitura'}, intervalo_verificacao=0)
+    with app.app_context():
+        roteador.iniciar()
+
+    @app.before_request
+    def decidir():
+        g.usar_replica = roteador.decidir(request.endpoint, request.method)
+
+    @app.route('/leitura')
+    def leitura():
+        return jsonify(valor=db.session.execute(text('SELECT 1')).scalar(), replica=g.usar_replica)
+
+    return app, roteador
+
+
+def _get_com_prazo(cliente, caminho, prazo=10):
+    resposta = {}
+    thread = threading.Thread(target=lambda: resposta.update(r=cliente.get(caminho)), daemon=True)
+    thread.start()
+    thread.join(prazo)
+    assert not thread.is_alive(), 'requisição travou com a réplica indisponível'
+    return resposta['r']
+
+
+def test_replica_indisponivel_usa_primario(aplicacao):
+    app, roteador = aplicacao
+    cliente = app.test_client()
+
+    for _ in range(3):
+        resposta = _get_com_prazo(cliente, '/leitura')
+        assert resposta.status_code == 200
+        assert resposta.get_json() == {'valor': 1, 'replica': False}
+
+    status = roteador.status()
+    assert status['saudavel'] is False
+    assert status['ultimo_erro']
+    assert status['leituras_replica'] == 0
+    assert status['leituras_primario'] == 3
+
+
+def test_marcar_falha_durante_verificacao_nao_trava(aplicacao):
+    app, roteador = aplicacao
+    # Simula o handle_error do SQLAlchemy disparando durante o connect() da verificação
+    roteador.engine.connect = lambda: roteador.marcar_falha(RuntimeError('fora do ar')) or 1 / 0
+
+    resultado = {}
+    thread = threading.Thread(target=lambda: resultado.update(ok=roteador.saudavel()), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert resultado['ok'] is False
@@ -0,0 +1,60 @@
+"""Validação das imagens enquanto o corpo do upload é gravado"""
+
+import os
+import struct
+import zlib
+
+import pytest
+
+from utils.uploads import ArquivoEmValidacao, UploadInvalido, UploadRecusado
+
+
+def png(largura, altura, extra=0):
+    ihdr = struct.pack('>IIBBBBB', largura, altura, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr
+            + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr)) + b'\0' * extra)
+
+
+def novo_arquivo(pasta):
+    return ArquivoEmValidacao(str(pasta), max_bytes=1024 * 1024, max_dimensao=6000,
+                              tipos_permitidos={'png', 'jpg', 'gif', 'webp'})
+
+
+def test_imagem_valida_e_movida_para_o_destino(tmp_path):
+    arquivo = novo_arquivo(tmp_path)
+    dados = png(100, 50, extra=1000)
+    arquivo.write(dados[:10])
+    arquivo.write(dados[10:])
+
+    assert arquivo.salvar('imagem') == 'imagem.png'
+    arquivo.close()
+    assert os.listdir(tmp_path) == ['imagem.png']
+    assert (tmp_path / 'imagem.png').read_bytes() == dados
+
+
+@pytest.mark.parametrize('dados', [
+    b'MZ' + b'x' * 100,
+    png(9000, 10),
+])
+def test_recusa_no_primeiro_bloco_e_remove_o_temporario(tmp_path, dados):
+    arquivo = novo_arquivo(tmp_path)
+    with pytest.raises(UploadRecusado):
+        arquivo.write(dados)
+    assert os.listdir(tmp_path) == []
+
+
+def test_recusa_acima_do_tamanho_maximo(tmp_path):
+    arquivo = novo_arquivo(tmp_path)
+    arquivo.write(png(10, 10))
+    with pytest.raises(UploadRecusado):
+        arquivo.write(b'\0' * (1024 * 1024))
+    assert os.listdir(tmp_path) == []
+
+
+def test_imagem_incompleta_nao_e_salva(tmp_path):
+    arquivo = novo_arquivo(tmp_path)
+    arquivo.write(png(10, 10)[:16])
+    with pytest.raises(UploadInvalido):
+        arquivo.salvar('imagem')
+    arquivo.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,424 @@
+"""
+Camada de cache com backends intercambiáveis
+
+Todos os caches da aplicação (configurações, páginas, fragmentos e APIs)
+passam por um GerenciadorCache, dividido em namespaces com TTL próprio.
+Backends disponíveis:
+
+- memoria: LRU em processo, com limite de itens e TTL (não compartilhado)
+- sqlite: arquivo local em modo WAL, compartilhado pelos workers do host
+- redis: qualquer servidor que fale o protocolo Redis (requer o pacote redis)
+
+Entradas podem receber tags; invalidar uma tag remove as entradas de todos
+os namespaces. Falhas do backend nunca derrubam a requisição: são tratadas
+como ausência no cache e contabilizadas.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, make_response, request
+
+from utils.diretorios import arquivo_privado
+
+logger = logging.getLogger(__name__)
+
+
+def _namespace_da_chave(chave):
+    return chave.split(':', 1)[0]
+
+
+class BackendMemoria:
+    """LRU em processo com expiração por TTL"""
+
+    nome = 'memoria'
+    compartilhado = False
+
+    def __init__(self, max_itens=1024):
+        self.max_itens = max_itens
+        self.remocoes = Counter()
+        self._itens = OrderedDict()  # chave -> (expira, valor, tags)
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _descartar(self, chave):
+        _, _, tags = self._itens.pop(chave)
+        for tag in tags:
+            self._tags[tag].discard(chave)
+            if not self._tags[tag]:
+                del self._tags[tag]
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return False, None
+            if item[0] < time.time():
+                self._descartar(chave)
+                return False, None
+            self._itens.move_to_end(chave)
+            return True, item[1]
+
+    def gravar(self, chave, valor, ttl, tags=()):
+        with self._lock:
+            if chave in self._itens:
+                self._descartar(chave)
+            self._itens[chave] = (time.time() + ttl, valor, tuple(tags))
+            for tag in tags:
+                self._tags[tag].add(chave)
+            while len(self._itens) > self.max_itens:
+                antiga = next(iter(self._itens))
+                self._descartar(antiga)
+                self.remocoes[_namespace_da_chave(antiga)] += 1
+
+    def remover(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                self._descartar(chave)
+
+    def invalidar_tag(self, tag):
+        with self._lock:
+            chaves = list(self._tags.get(tag, ()))
+            for chave in chaves:
+                self._descartar(chave)
+            return len(chaves)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._tags.clear()
+
+    def status(self):
+        with self._lock:
+            return {'backend': self.nome, 'ok': True, 'itens': len(self._itens)}
+
+
+class BackendSQLite:
+    """Cache em arquivo SQLite (WAL), compartilhado entre processos do mesmo host"""
+
+    nome = 'sqlite'
+    compartilhado = True
+
+    # A limpeza de expirados/excedentes roda a cada N gravações
+    INTERVALO_LIMPEZA = 50
+
+    def __init__(self, caminho, max_itens=10000):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.remocoes = Counter()
+        self._local = threading.local()
+        self._gravacoes = 0
+        self._lock = threading.Lock()
+
+        diretorio = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        # Os valores são lidos com pickle: o arquivo não pode ser gravável por outros usuários
+        arquivo_privado(caminho)
+        conexao = self._conexao()
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.executescript('''
+            CREATE TABLE IF NOT EXISTS cache (
+                chave TEXT PRIMARY KEY,
+                valor BLOB NOT NULL,
+                expira REAL NOT NULL,
+                criado REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_criado ON cache (criado);
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                PRIMARY KEY (tag, chave)
+            );
+        ''')
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo (workers são criados via fork)
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None or self._local.pid != os.getpid():
+            conexao = sqlite3.connect(self.caminho, timeout=2, isolation_level=None)
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            'SELECT valor, expira FROM cache WHERE chave = ?', (chave,)
+        ).fetchone()
+        if linha is None or linha[1] < time.time():
+            return False, None
+        return True, pickle.loads(linha[0])
+
+    def gravar(self, chave, valor, ttl, tags=()):
+        agora = time.time()
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute(
+                'INSERT OR REPLACE INTO cache (chave, valor, expira, criado) VALUES (?, ?, ?, ?)',
+                (chave, pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), agora + ttl, agora)
+            )
+            conexao.executemany(
+                'INSERT OR IGNORE INTO cache_tags (tag, chave) VALUES (?, ?)',
+                [(tag, chave) for tag in tags]
+            )
+
+        with self._lock:
+            self._gravacoes += 1
+            limpar = self._gravacoes % self.INTERVALO_LIMPEZA == 0
+        if limpar:
+            self._limpar_excedentes()
+
+    def _limpar_excedentes(self):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute('DELETE FROM cache WHERE expira < ?', (time.time(),))
+            excedentes = conexao.execute(
+                'SELECT chave FROM cache ORDER BY criado LIMIT max(0, (SELECT count(*) FROM cache) - ?)',
+                (self.max_itens,)
+            ).fetchall()
+            conexao.executemany('DELETE FROM cache WHERE chave = ?', excedentes)
+            conexao.execute('DELETE FROM cache_tags WHERE chave NOT IN (SELECT chave FROM cache)')
+        for (chave,) in excedentes:
+            self.remocoes[_namespace_da_chave(chave)] += 1
+
+    def remover(self, chave):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute('DELETE FROM cache WHERE chave = ?', (chave,))
+            conexao.execute('DELETE FROM cache_tags WHERE chave = ?', (chave,))
+
+    def invalidar_tag(self, tag):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            removidas = conexao.execute(
+                'DELETE FROM cache WHERE chave IN (SELECT chave FROM cache_tags WHERE tag = ?)', (tag,)
+            ).rowcount
+            conexao.execute('DELETE FROM cache_tags WHERE tag = ?', (tag,))
+        return removidas
+
+    def limpar(self):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            conexao.execute('DELETE FROM cache')
+            conexao.execute('DELETE FROM cache_tags')
+
+    def status(self):
+        itens = self._conexao().execute('SELECT count(*) FROM cache').fetchone()[0]
+        return {'backend': self.nome, 'ok': True, 'itens': itens}
+
+
+class BackendRedis:
+    """
+    Cache em servidor Redis (ou compatível). Aceita um cliente já criado,
+    o que permite testar com um substituto local (ex.: fakeredis).
+    """
+
+    nome = 'redis'
+    compartilhado = True
+
+    # Conjuntos de tags vivem pelo menos este tempo, para não perder entradas longas
+    TTL_MINIMO_TAGS = 86400
+
+    def __init__(self, url=None, cliente=None, prefixo='netfyber:'):
+        if cliente is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis' instalado")
+            cliente = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.cliente = cliente
+        self.prefixo = prefixo
+        # Remoções por memória/TTL são feitas pelo próprio servidor
+        self.remocoes = Counter()
+
+    def _chave(self, chave):
+        return f'{self.prefixo}{chave}'
+
+    def _chave_tag(self, tag):
+        return f'{self.prefixo}tag:{tag}'
+
+    def obter(self, chave):
+        valor = self.cliente.get(self._chave(chave))
+        if valor is None:
+            return False, None
+        return True, pickle.loads(valor)
+
+    def gravar(self, chave, valor, ttl, tags=()):
+        chave_completa = self._chave(chave)
+        pipe = self.cliente.pipeline()
+        pipe.set(chave_completa, pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), px=int(ttl * 1000))
+        for tag in tags:
+            pipe.sadd(self._chave_tag(tag), chave_completa)
+            pipe.expire(self._chave_tag(tag), max(int(ttl), self.TTL_MINIMO_TAGS))
+        pipe.execute()
+
+    def remover(self, chave):
+        self.cliente.delete(self._chave(chave))
+
+    def invalidar_tag(self, tag):
+        chave_tag = self._chave_tag(tag)
+        membros = list(self.cliente.smembers(chave_tag))
+        removidas = self.cliente.delete(*membros) if membros else 0
+        self.cliente.delete(chave_tag)
+        return removidas
+
+    def limpar(self):
+        chaves = list(self.cliente.scan_iter(match=f'{self.prefixo}*'))
+        if chaves:
+            self.cliente.delete(*chaves)
+
+    def status(self):
+        return {'backend': self.nome, 'ok': bool(self.cliente.ping())}
+
+
+def criar_backend(tipo, url=None, max_itens=None):
+    """Cria o backend configurado (CACHE_BACKEND / CACHE_URL)"""
+    if tipo == 'sqlite':
+        return BackendSQLite(url, max_itens=max_itens or 10000)
+    if tipo == 'redis':
+        return BackendRedis(url)
+    if tipo == 'memoria':
+        return BackendMemoria(max_itens=max_itens or 1024)
+    raise ValueError(f"Backend de cache desconhecido: {tipo}")
+
+
+class NamespaceCache:
+    """Visão de um namespace do cache, com TTL padrão e contadores próprios"""
+
+    def __init__(self, gerenciador, nome, ttl):
+        self.gerenciador = gerenciador
+        self.nome = nome
+        self.ttl = ttl
+        self.acertos = 0
+        self.falhas = 0
+        self.erros = 0
+
+    def _chave(self, chave):
+        return f'{self.nome}:{chave}'
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor)"""
+        try:
+            encontrado, valor = self.gerenciador.backend.obter(self._chave(chave))
+        except Exception as e:
+            self.erros += 1
+            logger.warning("Erro ao ler cache %s: %s", self.nome, e)
+            encontrado, valor = False, None
+        if encontrado:
+            self.acertos += 1
+        else:
+            self.falhas += 1
+        return encontrado, valor
+
+    def gravar(self, chave, valor, ttl=None, tags=()):
+        try:
+            self.gerenciador.backend.gravar(self._chave(chave), valor, ttl or self.ttl, tags)
+        except Exception as e:
+            self.erros += 1
+            logger.warning("Erro ao gravar cache %s: %s", self.nome, e)
+
+    def remover(self, chave):
+        try:
+            self.gerenciador.backend.remover(self._chave(chave))
+        except Exception as e:
+            self.erros += 1
+            logger.warning("Erro ao remover do cache %s: %s", self.nome, e)
+
+    def obter_ou_calcular(self, chave, calcular, ttl=None, tags=()):
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        valor = calcular()
+        self.gravar(chave, valor, ttl, tags)
+        return valor
+
+
+class GerenciadorCache:
+    """Ponto único de acesso ao cache da aplicação"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.namespaces = {}
+
+    def namespace(self, nome, ttl=300):
+        if nome not in self.namespaces:
+            self.namespaces[nome] = NamespaceCache(self, nome, ttl)
+        return self.namespaces[nome]
+
+    def invalidar_tags(self, *tags):
+        for tag in tags:
+            try:
+                self.backend.invalidar_tag(tag)
+            except Exception as e:
+                logger.warning("Erro ao invalidar tag de cache %s: %s", tag, e)
+
+    def estatisticas(self):
+        """Acertos/falhas/erros por namespace (neste processo) e remoções do backend"""
+        return {
+            nome: {
+                'acertos': ns.acertos,
+                'falhas': ns.falhas,
+                'erros': ns.erros,
+                'remocoes': self.backend.remocoes.get(nome, 0),
+                'ttl': ns.ttl,
+            }
+            for nome, ns in self.namespaces.items()
+        }
+
+    def status(self):
+        try:
+            return self.backend.status()
+        except Exception as e:
+            return {'backend': self.backend.nome, 'ok': False, 'erro': str(e)}
+
+
+def chave_da_requisicao(parametros=()):
+    """
+    Caminho + apenas os parâmetros de query string que a view lê, em ordem
+    fixa. Parâmetros desconhecidos (?x=<aleatório>) caem na mesma entrada.
+    """
+    valores = []
+    for nome in sorted(parametros):
+        valor = request.args.get(nome, '').strip()
+        if valor:
+            valores.append((nome, valor))
+    return f"{request.path}?{urlencode(valores)}" if valores else request.path
+
+
+def cache_resposta(namespace, ttl=None, tags=(), ignorar=None, parametros=()):
+    """
+    Decorator de rota: guarda respostas GET 200 por caminho + `parametros`
+    (os nomes de query string que a view usa; os demais são ignorados).
+    A view pode marcar g.sem_cache = True para não guardar a resposta atual
+    (ex.: página montada no caminho de erro).
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or (ignorar and ignorar()):
+                return view(*args, **kwargs)
+
+            chave = chave_da_requisicao(parametros)
+            encontrado, valor = namespace.obter(chave)
+            if encontrado:
+                corpo, content_type = valor
+                return current_app.response_class(corpo, status=200, content_type=content_type)
+
+            resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code == 200 and not resposta.direct_passthrough and not g.get('sem_cache'):
+                namespace.gravar(chave, (resposta.get_data(), resposta.content_type), ttl, tags)
+            return resposta
+        return wrapper
+    return decorador
@@ -0,0 +1,116 @@
+"""
+Leitura e escrita em fluxo de JSONL/CSV para importação e exportação
+
+Os arquivos são lidos e escritos registro a registro, e os lotes são
+montados de forma incremental, de modo que o uso de memória não depende do
+tamanho do arquivo.
+"""
+
+import csv
+import json
+import os
+from datetime import date, datetime
+from itertools import islice
+
+FORMATOS = ('jsonl', 'csv')
+
+
+def detectar_formato(caminho, formato=None):
+    """Usa o formato informado ou deduz pela extensão do arquivo"""
+    if formato:
+        return formato
+    extensao = os.path.splitext(caminho or '')[1].lower().lstrip('.')
+    if extensao in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if extensao == 'csv':
+        return 'csv'
+    raise ValueError("Não foi possível deduzir o formato; use --formato jsonl|csv")
+
+
+def ler_registros(arquivo, formato):
+    """Gera (número da linha, dicionário) a partir de um arquivo aberto em modo texto"""
+    if formato == 'csv':
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+        return
+
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            yield numero, ValueError(f"JSON inválido: {e}")
+            continue
+        if not isinstance(registro, dict):
+            yield numero, ValueError("Cada linha deve ser um objeto JSON")
+            continue
+        yield numero, registro
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def escrever_registros(arquivo, formato, campos, linhas):
+    """Escreve tuplas na ordem de `campos`, uma por vez. Retorna o total escrito."""
+    total = 0
+    if formato == 'csv':
+        escritor = csv.writer(arquivo)
+        escritor.writerow(campos)
+        for linha in linhas:
+            escritor.writerow([_serializar(valor) for valor in linha])
+            total += 1
+        return total
+
+    for linha in linhas:
+        registro = {campo: _serializar(valor) for campo, valor in zip(campos, linha)}
+        arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        total += 1
+    return total
+
+
+def em_lotes(iteravel, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens, sem materializá-lo"""
+    iterador = iter(iteravel)
+    while True:
+        lote = list(islice(iterador, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def booleano(valor, padrao=False):
+    """Converte valores de CSV/JSON ('1', 'true', 'sim', True...) para bool"""
+    if valor is None or valor == '':
+        return padrao
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'sim', 's', 'yes', 'y')
+
+
+def data_hora(valor):
+    """Aceita ISO 8601 ou dd/mm/aaaa. Retorna None para vazio."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor
+    texto = str(valor).strip()
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        return datetime.strptime(texto, '%d/%m/%Y')
+
+
+def identificador(valor):
+    """Id positivo de um registro exportado; None para vazio"""
+    if valor is None or valor == '':
+        return None
+    numero = int(str(valor).strip())
+    if numero <= 0:
+        raise ValueError(f'id inválido: {valor}')
+    return numero
@@ -0,0 +1,59 @@
+"""
+Diretórios privados para caches que carregam código ou objetos serializados
+
+O cache de bytecode do Jinja (marshal) e o cache em SQLite (pickle) executam
+o que leem: o diretório (ou arquivo) precisa pertencer ao usuário do
+processo e não pode ser acessível a outros usuários.
+"""
+
+import os
+import stat
+import tempfile
+
+
+def diretorio_privado(caminho=None, nome='netfyber'):
+    """
+    Cria (modo 0700) ou valida um diretório privado e retorna o caminho.
+    Sem `caminho`, usa <tmp>/<nome>-<uid>. Levanta RuntimeError se o
+    diretório pertencer a outro usuário ou for acessível a grupo/outros.
+    """
+    if caminho is None:
+        sufixo = os.getuid() if hasattr(os, 'getuid') else os.getlogin()
+        caminho = os.path.join(tempfile.gettempdir(), f'{nome}-{sufixo}')
+
+    try:
+        os.mkdir(caminho, 0o700)
+    except FileExistsError:
+        pass
+
+    info = os.lstat(caminho)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError(f"{caminho} não é um diretório")
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise RuntimeError(f"{caminho} pertence a outro usuário")
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            raise RuntimeError(f"{caminho} é acessível a outros usuários (use chmod 700)")
+    return caminho
+
+
+def arquivo_privado(caminho):
+    """
+    Cria o arquivo vazio com modo 0600 se não existir; se existir, exige que
+    pertença ao usuário do processo e não seja gravável por grupo/outros.
+    """
+    try:
+        os.close(os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+        return caminho
+    except FileExistsError:
+        pass
+
+    info = os.lstat(caminho)
+    if not stat.S_ISREG(info.st_mode):
+        raise RuntimeError(f"{caminho} não é um arquivo comum")
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise RuntimeError(f"{caminho} pertence a outro usuário")
+        if stat.S_IMODE(info.st_mode) & 0o022:
+            raise RuntimeError(f"{caminho} pode ser alterado por outros usuários (use chmod 600)")
+    return caminho
@@ -0,0 +1,205 @@
+"""
+Exportação estática do site público
+
+Renderiza as rotas públicas através do próprio Flask (test client) e grava o
+resultado em um diretório pronto para hospedagem estática/CDN. Os arquivos
+de static/ são copiados também com o hash do conteúdo no nome, e as páginas
+exportadas passam a referenciar esses nomes.
+
+Rotas dinâmicas (ex.: as APIs do velocímetro, que medem a latência até o
+servidor) não são exportadas: o _redirects as encaminha para a origem Flask
+quando `origem` é informada.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from flask import has_request_context, request
+
+CHAVE_EXPORTACAO = 'netfyber.exportacao'
+
+
+def nome_com_hash(caminho_relativo, conteudo):
+    """css/main.css -> css/main.1a2b3c4d.css"""
+    digest = hashlib.sha256(conteudo).hexdigest()[:8]
+    base, extensao = os.path.splitext(caminho_relativo)
+    return f"{base}.{digest}{extensao}"
+
+
+def gravar_atomico(destino, conteudo):
+    """Grava o arquivo em um temporário e renomeia, para nunca servir meio arquivo"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, destino)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+class ExportadorEstatico:
+    """Gera e atualiza a cópia estática das rotas públicas"""
+
+    def __init__(self, app, destino, rotas, pastas_sem_hash=(), rotas_dinamicas=(), origem=''):
+        self.app = app
+        self.destino = destino
+        self.rotas = rotas
+        self.pastas_sem_hash = tuple(pastas_sem_hash)
+        self.rotas_dinamicas = tuple(rotas_dinamicas)
+        self.origem = origem.rstrip('/')
+        self.manifesto = {}
+
+        app.url_defaults(self._url_com_hash)
+
+    def _url_com_hash(self, endpoint, values):
+        # Só reescreve URLs de static/ durante a renderização para exportação
+        if endpoint != 'static' or not has_request_context():
+            return
+        if not request.environ.get(CHAVE_EXPORTACAO):
+            return
+        filename = values.get('filename')
+        if filename in self.manifesto:
+            values['filename'] = self.manifesto[filename]
+
+    def caminho_arquivo(self, url):
+        """Mapeia a URL pública para o arquivo gravado no diretório de saída"""
+        caminho = url.strip('/')
+        if caminho.startswith('api/'):
+            return os.path.join(self.destino, caminho + '.json')
+        return os.path.join(self.destino, caminho, 'index.html')
+
+    def copiar_assets(self):
+        """Copia static/ com e sem hash no nome e grava o manifesto"""
+        origem = self.app.static_folder
+        destino_static = os.path.join(self.destino, 'static')
+        manifesto = {}
+
+        for raiz, _, arquivos in os.walk(origem):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, origem).replace(os.sep, '/')
+                with open(caminho, 'rb') as arquivo:
+                    conteudo = arquivo.read()
+
+                # O nome original continua disponível para referências internas (ex.: url() no CSS)
+                gravar_atomico(os.path.join(destino_static, relativo), conteudo)
+                if relativo.startswith(self.pastas_sem_hash):
+                    continue
+
+                com_hash = nome_com_hash(relativo, conteudo)
+                gravar_atomico(os.path.join(destino_static, com_hash), conteudo)
+                manifesto[relativo] = com_hash
+
+        gravar_atomico(
+            os.path.join(self.destino, 'static', 'manifest.json'),
+            json.dumps(manifesto, indent=2, sort_keys=True).encode('utf-8')
+        )
+        self.manifesto = manifesto
+        return manifesto
+
+    def sincronizar_pasta(self, pasta):
+        """
+        Copia de static/<pasta> apenas os arquivos novos ou alterados e remove
+        da exportação os que não existem mais (ex.: uploads do blog)
+        """
+        origem = os.path.join(self.app.static_folder, pasta)
+        destino = os.path.join(self.destino, 'static', pasta)
+        existentes = set()
+        copiados = removidos = 0
+
+        for raiz, _, arquivos in os.walk(origem):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, origem)
+                existentes.add(relativo)
+                alvo = os.path.join(destino, relativo)
+                info = os.stat(caminho)
+                if os.path.exists(alvo):
+                    info_alvo = os.stat(alvo)
+                    if info_alvo.st_size == info.st_size and info_alvo.st_mtime >= info.st_mtime:
+                        continue
+                with open(caminho, 'rb') as arquivo:
+                    gravar_atomico(alvo, arquivo.read())
+                copiados += 1
+
+        for raiz, _, arquivos in os.walk(destino):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                if os.path.relpath(caminho, destino) not in existentes:
+                    os.remove(caminho)
+                    removidos += 1
+        return copiados, removidos
+
+    def remover_obsoletas(self, urls, prefixos=None):
+        """
+        Remove páginas exportadas que não estão mais em `urls` (ex.: páginas do
+        blog além da última). Com `prefixos`, só considera as URLs que começam
+        com eles; static/ nunca é tocado.
+        """
+        atuais = {self.caminho_arquivo(url) for url in urls}
+        removidas = []
+        for raiz, diretorios, arquivos in os.walk(self.destino, topdown=False):
+            relativo = os.path.relpath(raiz, self.destino).replace(os.sep, '/')
+            if relativo == 'static' or relativo.startswith('static/'):
+                continue
+            for nome in arquivos:
+                if nome != 'index.html' and not nome.endswith('.json'):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                if caminho in atuais:
+                    continue
+                url = '/' + (relativo if nome == 'index.html' else f"{relativo}/{nome[:-5]}").strip('./')
+                if prefixos is not None and not url.startswith(tuple(prefixos)):
+                    continue
+                os.remove(caminho)
+                removidas.append(url)
+            if raiz != self.destino and not os.listdir(raiz):
+                os.rmdir(raiz)
+        return removidas
+
+    def carregar_manifesto(self):
+        caminho = os.path.join(self.destino, 'static', 'manifest.json')
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                self.manifesto = json.load(arquivo)
+        return self.manifesto
+
+    def renderizar(self, urls):
+        """Renderiza as URLs informadas e grava o resultado. Retorna as falhas."""
+        falhas = []
+        cliente = self.app.test_client()
+        for url in urls:
+            resposta = cliente.get(url, environ_base={CHAVE_EXPORTACAO: True})
+            if resposta.status_code != 200:
+                falhas.append((url, resposta.status_code))
+                continue
+            gravar_atomico(self.caminho_arquivo(url), resposta.get_data())
+        return falhas
+
+    def gravar_redirecionamentos(self, urls):
+        """Regras de reescrita (formato _redirects) para as APIs JSON e as rotas dinâmicas"""
+        linhas = [f"{url} {url}.json 200" for url in urls if url.startswith('/api/')]
+        for rota in self.rotas_dinamicas:
+            if not self.origem:
+                linhas.append(f"# {rota}: rota dinâmica, sirva pelo Flask (EXPORTACAO_ORIGEM_URL)")
+                continue
+            alvo = rota[:-1] + ':splat' if rota.endswith('*') else rota
+            linhas.append(f"{rota} {self.origem}{alvo} 200")
+        gravar_atomico(os.path.join(self.destino, '_redirects'), ('\n'.join(linhas) + '\n').encode('utf-8'))
+
+    def congelar(self, limpar=False):
+        """Exportação completa do site público"""
+        if limpar and os.path.isdir(self.destino):
+            shutil.rmtree(self.destino)
+        self.copiar_assets()
+        urls = self.rotas()
+        self.gravar_redirecionamentos(urls)
+        falhas = self.renderizar(urls)
+        self.remover_obsoletas(urls)
+        return urls, falhas
@@ -0,0 +1,16 @@
+"""
+Cache de fragmentos de template
+
+Partes do layout que dependem apenas das configurações do site (barra de
+contato, rodapé) são renderizadas uma vez por versão das configurações e
+reaproveitadas nas páginas seguintes. O armazenamento fica no namespace
+'fragmentos' da camada de cache (utils.cache).
+"""
+
+import hashlib
+
+
+def versao_configs(configs):
+    """Gera uma versão estável a partir do conteúdo das configurações"""
+    conteudo = repr(sorted((configs or {}).items())).encode('utf-8')
+    return hashlib.sha1(conteudo).hexdigest()[:16]
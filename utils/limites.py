@@ -0,0 +1,236 @@
+"""
+Limite de requisições (token bucket) e descarte de carga para as APIs públicas
+
+Cada endpoint limitado tem uma RegraLimite com dois baldes: um por cliente
+(IP) e um global. Antes dos baldes, a requisição é descartada com 503 quando
+o tempo de fila no proxy (X-Request-Start) ou a latência recente do banco
+(só consultas feitas em requisições) passam dos limites configurados, para que as páginas comuns continuem
+respondendo durante picos.
+
+Os baldes ficam em memória em cada worker: com N workers, o limite efetivo
+é até N vezes o configurado.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque, namedtuple
+
+from flask import has_request_context
+from sqlalchemy import event
+
+# Taxas em requisições por segundo; rajada = capacidade do balde
+RegraLimite = namedtuple('RegraLimite', 'taxa_cliente rajada_cliente taxa_global rajada_global')
+
+# Motivos de rejeição (também usados como chaves dos contadores)
+EXCESSO_CLIENTE = 'excesso_cliente'
+EXCESSO_GLOBAL = 'excesso_global'
+FILA_ALTA = 'fila_alta'
+BANCO_LENTO = 'banco_lento'
+
+
+def regra_do_ambiente(ambiente, prefixo, padrao):
+    """
+    Lê `{prefixo}_CLIENTE` e `{prefixo}_GLOBAL` no formato "taxa/rajada"
+    (ex.: "2/10"). Valores ausentes mantêm os da regra padrão.
+    """
+    def ler(sufixo, taxa, rajada):
+        valor = ambiente.get(f'{prefixo}_{sufixo}')
+        if not valor:
+            return taxa, rajada
+        taxa_texto, _, rajada_texto = valor.partition('/')
+        taxa = float(taxa_texto)
+        return taxa, float(rajada_texto) if rajada_texto else max(taxa, 1.0)
+
+    taxa_cliente, rajada_cliente = ler('CLIENTE', padrao.taxa_cliente, padrao.rajada_cliente)
+    taxa_global, rajada_global = ler('GLOBAL', padrao.taxa_global, padrao.rajada_global)
+    return RegraLimite(taxa_cliente, rajada_cliente, taxa_global, rajada_global)
+
+
+def tempo_de_fila(cabecalho, agora=None):
+    """
+    Segundos desde que o proxy recebeu a requisição, a partir de
+    X-Request-Start ("t=1700000000123", em s, ms ou µs). None se ausente.
+    """
+    if not cabecalho:
+        return None
+    texto = cabecalho.strip()
+    if texto.startswith('t='):
+        texto = texto[2:]
+    try:
+        inicio = float(texto)
+    except ValueError:
+        return None
+    if inicio > 1e14:
+        inicio /= 1_000_000
+    elif inicio > 1e11:
+        inicio /= 1000
+    agora = time.time() if agora is None else agora
+    return max(agora - inicio, 0.0)
+
+
+class BaldeTokens:
+    """Token bucket: `capacidade` tokens, repostos a `taxa` por segundo"""
+
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado_em = time.monotonic()
+
+    def consumir(self, agora):
+        """Retorna 0 se admitida ou os segundos até haver um token disponível"""
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.taxa <= 0:
+            return 60.0
+        return (1 - self.tokens) / self.taxa
+
+
+class MedidorLatenciaBanco:
+    """
+    Duração média das consultas feitas durante requisições nos últimos
+    `janela` segundos. Consultas de threads em segundo plano (tarefas,
+    prontidão, buffer do velocímetro) não entram na média.
+
+    Com menos de `min_amostras` na janela a latência é considerada 0: uma
+    consulta lenta isolada não dispara o descarte, e como as requisições
+    descartadas não consultam o banco, as amostras expiram e o descarte
+    termina sozinho.
+    """
+
+    def __init__(self, janela=10, min_amostras=5, max_amostras=1000):
+        self.janela = janela
+        self.min_amostras = min_amostras
+        self._amostras = deque(maxlen=max_amostras)
+        self._soma = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def registrar_eventos(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._antes)
+        event.listen(engine, 'after_cursor_execute', self._depois)
+
+    def _antes(self, *args):
+        self._local.inicio = time.perf_counter() if has_request_context() else None
+
+    def _depois(self, *args):
+        inicio = getattr(self._local, 'inicio', None)
+        if inicio is not None:
+            self._local.inicio = None
+            self.registrar((time.perf_counter() - inicio) * 1000)
+
+    def registrar(self, duracao_ms):
+        agora = time.monotonic()
+        with self._lock:
+            if len(self._amostras) == self._amostras.maxlen:
+                self._soma -= self._amostras[0][1]
+            self._amostras.append((agora, duracao_ms))
+            self._soma += duracao_ms
+            self._expirar(agora)
+
+    def _expirar(self, agora):
+        while self._amostras and agora - self._amostras[0][0] > self.janela:
+            self._soma -= self._amostras.popleft()[1]
+        if not self._amostras:
+            self._soma = 0.0
+
+    def amostras(self):
+        with self._lock:
+            self._expirar(time.monotonic())
+            return len(self._amostras)
+
+    def atual(self):
+        with self._lock:
+            self._expirar(time.monotonic())
+            if len(self._amostras) < self.min_amostras:
+                return 0.0
+            return self._soma / len(self._amostras)
+
+
+class LimitadorRequisicoes:
+    """Aplica as regras por endpoint e mantém os contadores de admissão"""
+
+    def __init__(self, regras, max_fila_ms=0, max_latencia_banco_ms=0,
+                 retry_after_descarte=5, max_clientes=10000, medidor=None):
+        self.regras = dict(regras)
+        self.max_fila_ms = max_fila_ms
+        self.max_latencia_banco_ms = max_latencia_banco_ms
+        self.retry_after_descarte = retry_after_descarte
+        self.max_clientes = max_clientes
+        self.medidor = medidor or MedidorLatenciaBanco()
+        self._globais = {
+            endpoint: BaldeTokens(regra.taxa_global, regra.rajada_global)
+            for endpoint, regra in self.regras.items()
+        }
+        self._clientes = OrderedDict()
+        self._lock = threading.Lock()
+        self.admitidas = Counter()
+        self.rejeitadas = Counter()
+
+    def limita(self, endpoint):
+        return endpoint in self.regras
+
+    def _balde_cliente(self, endpoint, cliente, regra):
+        chave = (endpoint, cliente)
+        balde = self._clientes.get(chave)
+        if balde is None:
+            balde = BaldeTokens(regra.taxa_cliente, regra.rajada_cliente)
+            self._clientes[chave] = balde
+            if len(self._clientes) > self.max_clientes:
+                self._clientes.popitem(last=False)
+        else:
+            self._clientes.move_to_end(chave)
+        return balde
+
+    def verificar(self, endpoint, cliente, fila_segundos=None):
+        """
+        Retorna None se a requisição foi admitida, ou (status, retry_after, motivo).
+        O descarte por sobrecarga (503) é verificado antes dos baldes (429).
+        """
+        regra = self.regras.get(endpoint)
+        if regra is None:
+            return None
+
+        if self.max_fila_ms and fila_segundos is not None and fila_segundos * 1000 > self.max_fila_ms:
+            return self._rejeitar(endpoint, FILA_ALTA, 503, self.retry_after_descarte)
+        if self.max_latencia_banco_ms and self.medidor.atual() > self.max_latencia_banco_ms:
+            return self._rejeitar(endpoint, BANCO_LENTO, 503, self.retry_after_descarte)
+
+        agora = time.monotonic()
+        with self._lock:
+            espera = self._balde_cliente(endpoint, cliente, regra).consumir(agora)
+            if espera:
+                return self._rejeitar(endpoint, EXCESSO_CLIENTE, 429, espera)
+            espera = self._globais[endpoint].consumir(agora)
+            if espera:
+                return self._rejeitar(endpoint, EXCESSO_GLOBAL, 429, espera)
+            self.admitidas[endpoint] += 1
+        return None
+
+    def _rejeitar(self, endpoint, motivo, status, espera):
+        self.rejeitadas[(endpoint, motivo)] += 1
+        return status, max(1, math.ceil(espera)), motivo
+
+    def estatisticas(self):
+        por_endpoint = {}
+        for endpoint in self.regras:
+            rejeitadas = {
+                motivo: total for (nome, motivo), total in self.rejeitadas.items() if nome == endpoint
+            }
+            por_endpoint[endpoint] = {
+                'regra': self.regras[endpoint]._asdict(),
+                'admitidas': self.admitidas[endpoint],
+                'rejeitadas': rejeitadas,
+            }
+        return {
+            'endpoints': por_endpoint,
+            'clientes_rastreados': len(self._clientes),
+            'latencia_banco_ms': round(self.medidor.atual(), 2),
+            'amostras_banco': self.medidor.amostras(),
+            'max_fila_ms': self.max_fila_ms,
+            'max_latencia_banco_ms': self.max_latencia_banco_ms,
+        }
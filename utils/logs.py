@@ -0,0 +1,168 @@
+"""
+Logs estruturados (JSON por linha) gravados fora do caminho da requisição
+
+As threads de requisição apenas colocam o registro em uma fila limitada
+(put_nowait); uma thread em segundo plano (QueueListener) formata e escreve
+na saída. Com a fila cheia o registro é descartado e contado, nunca
+bloqueando a requisição.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Atributos padrão de LogRecord; o restante (extra=...) vira campo do JSON
+_ATRIBUTOS_PADRAO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em `extra`"""
+
+    def format(self, record):
+        dados = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                dados[chave] = valor
+        if record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FiltroContexto(logging.Filter):
+    """Acrescenta campos do contexto corrente (ex.: request_id) a todo registro"""
+
+    def __init__(self, obter_campos):
+        super().__init__()
+        self.obter_campos = obter_campos
+
+    def filter(self, record):
+        for chave, valor in self.obter_campos().items():
+            if not hasattr(record, chave):
+                setattr(record, chave, valor)
+        return True
+
+
+class HandlerFilaLimitada(QueueHandler):
+    """
+    QueueHandler com fila limitada e listener iniciado no primeiro uso
+    (assim a thread existe em cada worker, mesmo após o fork do gunicorn).
+    """
+
+    def __init__(self, destino, tamanho_fila=10000):
+        super().__init__(queue.Queue(maxsize=tamanho_fila))
+        self.destino = destino
+        self.tamanho_fila = tamanho_fila
+        self.descartados = 0
+        self._listener = None
+        self._lock = threading.Lock()
+        self._atexit_registrado = False
+
+    def prepare(self, record):
+        # Resolve mensagem e traceback aqui: args e exc_info podem não ser serializáveis depois
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._iniciar_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+    def _iniciar_listener(self):
+        if self._listener is not None and self._listener._thread is not None and self._listener._thread.is_alive():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener._thread is not None and self._listener._thread.is_alive():
+                return
+            self._listener = QueueListener(self.queue, self.destino, respect_handler_level=True)
+            self._listener.start()
+            if not self._atexit_registrado:
+                atexit.register(self.parar)
+                self._atexit_registrado = True
+
+    def parar(self):
+        """Escreve o que estiver na fila e encerra o listener"""
+        if self._listener is None or self._listener._thread is None:
+            return
+        try:
+            self._listener.stop()
+        except queue.Full:
+            pass
+
+    def status(self):
+        return {
+            'fila': self.queue.qsize(),
+            'capacidade_fila': self.tamanho_fila,
+            'descartados': self.descartados,
+        }
+
+
+def configurar_logs(nivel='INFO', tamanho_fila=10000, obter_campos=None, saida=None):
+    """
+    Troca os handlers do logger raiz pelo handler com fila.
+    Retorna o HandlerFilaLimitada (para status e contagem de descartes).
+
+    A saída padrão é stderr: stdout fica livre para os dados dos comandos
+    de CLI (ex.: `flask dados exportar > arquivo.jsonl`).
+    """
+    destino = logging.StreamHandler(saida or sys.stderr)
+    destino.setFormatter(FormatadorJSON())
+
+    handler = HandlerFilaLimitada(destino, tamanho_fila=tamanho_fila)
+    if obter_campos is not None:
+        handler.addFilter(FiltroContexto(obter_campos))
+
+    raiz = logging.getLogger()
+    for existente in list(raiz.handlers):
+        raiz.removeHandler(existente)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+    return handler
+
+
+class AmostradorAcesso:
+    """
+    Decide quais requisições entram no log de acesso: erros (>= 500) e
+    requisições lentas sempre; as demais na proporção `taxa` (1 a cada 1/taxa).
+    """
+
+    def __init__(self, taxa=0.1, lento_ms=1000):
+        self.taxa = taxa
+        self.lento_ms = lento_ms
+        self._acumulado = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, status, duracao_ms):
+        if status >= 500 or duracao_ms >= self.lento_ms:
+            return True
+        if self.taxa <= 0:
+            return False
+        if self.taxa >= 1:
+            return True
+        # Amostragem determinística: sem custo de random e com proporção exata
+        with self._lock:
+            self._acumulado += self.taxa
+            if self._acumulado >= 1:
+                self._acumulado -= 1
+                return True
+        return False
+
+
+def duracao_ms(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 2)
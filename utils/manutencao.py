@@ -0,0 +1,139 @@
+"""
+Framework de manutenção em lotes
+
+Percorre uma tabela por chave (id) em lotes, com yield_per dentro de cada
+lote. Cada lote é confirmado separadamente e o último id processado fica
+salvo como checkpoint, então uma execução interrompida continua de onde
+parou. Em modo --dry-run as alterações são calculadas e descartadas, e o
+resultado é um resumo das diferenças.
+"""
+
+import time
+from collections import Counter
+
+
+class RelatorioManutencao:
+    """Contadores de progresso e resumo das diferenças encontradas"""
+
+    def __init__(self, nome, max_exemplos=10):
+        self.nome = nome
+        self.max_exemplos = max_exemplos
+        self.lidas = 0
+        self.alteradas = 0
+        self.lotes = 0
+        self.campos = Counter()
+        self.exemplos = []
+        self.inicio = time.perf_counter()
+
+    def registrar(self, identificador, diferencas):
+        self.lidas += 1
+        if not diferencas:
+            return
+        self.alteradas += 1
+        self.campos.update(diferencas.keys())
+        if len(self.exemplos) < self.max_exemplos:
+            self.exemplos.append((identificador, diferencas))
+
+    @property
+    def linhas_por_segundo(self):
+        decorrido = time.perf_counter() - self.inicio
+        return self.lidas / decorrido if decorrido > 0 else 0.0
+
+    def resumo(self):
+        linhas = [
+            f"📊 {self.nome}: {self.lidas} linhas lidas, {self.alteradas} alteradas "
+            f"em {self.lotes} lotes ({self.linhas_por_segundo:.0f} linhas/s)"
+        ]
+        for campo, total in self.campos.most_common():
+            linhas.append(f"   {campo}: {total} alterações")
+        for identificador, diferencas in self.exemplos:
+            for campo, (antes, depois) in diferencas.items():
+                linhas.append(f"   #{identificador} {campo}: {_abreviar(antes)!r} -> {_abreviar(depois)!r}")
+        return '\n'.join(linhas)
+
+
+def _abreviar(valor, limite=60):
+    if isinstance(valor, str) and len(valor) > limite:
+        return valor[:limite] + '...'
+    return valor
+
+
+class CheckpointsManutencao:
+    """Leitura e gravação do último id processado por tarefa"""
+
+    def __init__(self, db, modelo):
+        self.db = db
+        self.modelo = modelo
+
+    def carregar(self, nome):
+        registro = self.modelo.query.filter_by(nome=nome).first()
+        return registro.ultimo_id if registro else 0
+
+    def salvar(self, nome, ultimo_id):
+        """Grava o checkpoint na transação corrente (confirmada junto com o lote)"""
+        registro = self.modelo.query.filter_by(nome=nome).first()
+        if registro is None:
+            registro = self.modelo(nome=nome)
+            self.db.session.add(registro)
+        registro.ultimo_id = ultimo_id
+
+    def remover(self, nome):
+        self.modelo.query.filter_by(nome=nome).delete()
+        self.db.session.commit()
+
+
+def executar_em_lotes(db, modelo, processar, campos, nome, checkpoints, filtro=None,
+                      tamanho_lote=500, dry_run=False, reiniciar=False, eco=print):
+    """
+    Aplica `processar(registro)` a todos os registros de `modelo`, lote a lote.
+    As diferenças são calculadas comparando `campos` antes e depois.
+    Retorna o RelatorioManutencao.
+    """
+    relatorio = RelatorioManutencao(nome)
+    ultimo_id = 0 if (reiniciar or dry_run) else checkpoints.carregar(nome)
+    if ultimo_id:
+        eco(f"↪️  Retomando {nome} após o id {ultimo_id}")
+
+    while True:
+        consulta = modelo.query
+        if filtro is not None:
+            consulta = consulta.filter(filtro)
+        consulta = consulta.filter(modelo.id > ultimo_id).order_by(modelo.id).limit(tamanho_lote)
+
+        inicio_lote = ultimo_id
+        lidas_no_lote = 0
+        try:
+            for registro in consulta.yield_per(tamanho_lote):
+                antes = {campo: getattr(registro, campo) for campo in campos}
+                processar(registro)
+                diferencas = {
+                    campo: (antes[campo], getattr(registro, campo))
+                    for campo in campos if getattr(registro, campo) != antes[campo]
+                }
+                relatorio.registrar(registro.id, diferencas)
+                ultimo_id = registro.id
+                lidas_no_lote += 1
+
+            if lidas_no_lote == 0:
+                break
+
+            if dry_run:
+                db.session.rollback()
+            else:
+                checkpoints.salvar(nome, ultimo_id)
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            eco(f"❌ Falha no lote após o id {inicio_lote}; lotes anteriores foram mantidos")
+            raise
+
+        relatorio.lotes += 1
+        eco(f"   lote {relatorio.lotes}: até o id {ultimo_id}, {relatorio.lidas} linhas "
+            f"({relatorio.linhas_por_segundo:.0f} linhas/s), {relatorio.alteradas} alteradas")
+
+        if lidas_no_lote < tamanho_lote:
+            break
+
+    if not dry_run:
+        checkpoints.remover(nome)
+    return relatorio
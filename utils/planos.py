@@ -0,0 +1,84 @@
+"""
+Valores numéricos dos planos a partir dos textos livres do painel
+
+Preço e velocidade são digitados como texto ("R$ 99,90", "100 Mbps",
+"1 Giga"). As colunas preco_centavos e velocidade_mbps guardam esses valores
+já convertidos, para que filtros e ordenação rodem no banco.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+
+_NUMERO = re.compile(r'\d[\d.,]*')
+_VELOCIDADE = re.compile(
+    r'\b(\d+(?:[.,]\d+)*)\s*(gbps|gb|giga|g|mbps|mb|mega|m)?\b',
+    re.IGNORECASE
+)
+# Para textos que não são de velocidade (ex.: o nome do plano): só números com
+# unidade explícita contam ("Plano Família 2025" e "Turbo 4G" não são velocidades)
+_VELOCIDADE_COM_UNIDADE = re.compile(
+    r'\b(\d+(?:[.,]\d+)*)\s*(gbps|gb|gigas?|mbps|mb|megas?)\b',
+    re.IGNORECASE
+)
+
+# Valores aceitos em ?sort= da API, e a coluna/direção correspondentes
+ORDENACOES = {
+    'price': ('preco_centavos', False),
+    '-price': ('preco_centavos', True),
+    'speed': ('velocidade_mbps', False),
+    '-speed': ('velocidade_mbps', True),
+}
+
+
+def _decimal(texto):
+    """
+    Normaliza separadores no formato brasileiro ou internacional:
+    "1.299,90", "1,299.90", "99,9", "99.90", "1.299" -> Decimal
+    """
+    texto = texto.rstrip('.,')
+    if ',' in texto and '.' in texto:
+        decimal_sep = ',' if texto.rfind(',') > texto.rfind('.') else '.'
+        milhar_sep = '.' if decimal_sep == ',' else ','
+        texto = texto.replace(milhar_sep, '').replace(decimal_sep, '.')
+    elif ',' in texto:
+        inteiro, _, fracao = texto.rpartition(',')
+        texto = f"{inteiro.replace(',', '')}.{fracao}" if len(fracao) <= 2 else texto.replace(',', '')
+    elif texto.count('.') > 1 or re.search(r'\.\d{3}$', texto):
+        texto = texto.replace('.', '')
+    return Decimal(texto)
+
+
+def preco_em_centavos(texto):
+    """'R$ 99,90/mês' -> 9990. None se não houver número."""
+    if texto is None:
+        return None
+    encontrado = _NUMERO.search(str(texto))
+    if not encontrado:
+        return None
+    try:
+        return int((_decimal(encontrado.group()) * 100).quantize(Decimal('1')))
+    except InvalidOperation:
+        return None
+
+
+def velocidade_em_mbps(texto, exigir_unidade=False):
+    """
+    '100 Mbps' -> 100, '1 Giga' -> 1000, '1.000 Mega' -> 1000, '500MB' -> 500
+    (separadores como em preco_em_centavos). Números sem unidade
+    são considerados Mbps, exceto com `exigir_unidade` (usado no nome do
+    plano), que aceita apenas Mbps/MB/Mega/Gbps/GB/Giga. None se não houver.
+    """
+    if not texto:
+        return None
+    padrao = _VELOCIDADE_COM_UNIDADE if exigir_unidade else _VELOCIDADE
+    encontrado = padrao.search(str(texto))
+    if not encontrado:
+        return None
+    try:
+        valor = _decimal(encontrado.group(1))
+    except InvalidOperation:
+        return None
+    unidade = (encontrado.group(2) or 'm').lower()
+    if unidade.startswith('g'):
+        valor *= 1000
+    return int(valor)
@@ -0,0 +1,143 @@
+"""
+Roteamento de leituras para uma réplica do banco
+
+Rotas públicas somente leitura podem ser atendidas por uma réplica
+(SQLALCHEMY_BINDS['replica']). O primário continua sendo usado para:
+- qualquer rota fora da lista de leitura (admin, POSTs)
+- flush/commit dentro de uma requisição roteada
+- a janela após uma alteração do admin (leitura das próprias escritas)
+- réplica indisponível: a verificação é feita no máximo a cada
+  `intervalo_verificacao` segundos e erros de conexão a marcam como falha
+"""
+
+import threading
+import time
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+CHAVE_FIXAR_PRIMARIO = 'primario_ate'
+
+
+class RoteadorReplica:
+    """Decide, por requisição, se as leituras podem ir para a réplica"""
+
+    def __init__(self, db, chave_bind='replica', endpoints=(), intervalo_verificacao=10,
+                 fixar_segundos=30, cache=None):
+        self.db = db
+        self.chave_bind = chave_bind
+        self.endpoints = set(endpoints)
+        self.intervalo_verificacao = intervalo_verificacao
+        self.fixar_segundos = fixar_segundos
+        self.cache = cache
+        self.leituras_replica = 0
+        self.leituras_primario = 0
+        self._saudavel = True
+        self._verificado_em = 0.0
+        self._ultimo_erro = None
+        self._lock = threading.Lock()
+        # Só uma thread verifica por vez; separado de _lock porque uma falha no
+        # connect() chama marcar_falha (handle_error) na mesma thread
+        self._verificando = threading.Lock()
+        self.engine = None
+
+    def iniciar(self):
+        """
+        Localiza o engine da réplica (requer contexto de aplicação) e passa a
+        marcá-la como indisponível assim que uma conexão falhar.
+        """
+        if self.engine is not None:
+            return
+        self.engine = self.db.engines.get(self.chave_bind)
+        if self.engine is not None:
+            event.listen(self.engine, 'handle_error', self._ao_erro)
+
+    def configurado(self):
+        return self.engine is not None
+
+    def _ao_erro(self, contexto):
+        if contexto.is_disconnect or contexto.connection is None:
+            self.marcar_falha(contexto.original_exception)
+
+    def marcar_falha(self, erro=None):
+        with self._lock:
+            self._saudavel = False
+            self._verificado_em = time.monotonic()
+            self._ultimo_erro = str(erro) if erro else None
+
+    def saudavel(self):
+        """Estado da réplica, reverificado com SELECT 1 a cada intervalo"""
+        if time.monotonic() - self._verificado_em < self.intervalo_verificacao:
+            return self._saudavel
+        if not self._verificando.acquire(blocking=False):
+            # Outra thread já está verificando; usa o último estado conhecido
+            return self._saudavel
+        try:
+            try:
+                with self.engine.connect() as conexao:
+                    conexao.execute(text('SELECT 1'))
+            except Exception as e:
+                self.marcar_falha(e)
+            else:
+                with self._lock:
+                    self._saudavel = True
+                    self._verificado_em = time.monotonic()
+                    self._ultimo_erro = None
+        finally:
+            self._verificando.release()
+        return self._saudavel
+
+    def fixar_primario(self):
+        """Após uma escrita, todas as leituras vão ao primário durante `fixar_segundos`"""
+        if self.cache is not None:
+            self.cache.gravar(CHAVE_FIXAR_PRIMARIO, time.time() + self.fixar_segundos, ttl=self.fixar_segundos)
+
+    def primario_fixado(self):
+        if self.cache is None:
+            return False
+        encontrado, ate = self.cache.obter(CHAVE_FIXAR_PRIMARIO)
+        return encontrado and ate > time.time()
+
+    def decidir(self, endpoint, metodo):
+        """Chamado no before_request; o resultado vale para toda a requisição"""
+        usar = (
+            self.configurado()
+            and metodo in ('GET', 'HEAD')
+            and endpoint in self.endpoints
+            and not self.primario_fixado()
+            and self.saudavel()
+        )
+        if usar:
+            self.leituras_replica += 1
+        else:
+            self.leituras_primario += 1
+        return usar
+
+    def ativo_na_requisicao(self):
+        return has_request_context() and g.get('usar_replica', False)
+
+    def status(self):
+        return {
+            'configurada': self.configurado(),
+            'saudavel': self._saudavel,
+            'ultimo_erro': self._ultimo_erro,
+            'leituras_replica': self.leituras_replica,
+            'leituras_primario': self.leituras_primario,
+        }
+
+
+def criar_sessao_roteada(roteador_fn):
+    """
+    Classe de sessão para SQLAlchemy(session_options={'class_': ...}).
+    `roteador_fn` devolve o RoteadorReplica (criado depois do db).
+    """
+    class SessaoRoteada(Session):
+        def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+            roteador = roteador_fn()
+            if (bind is None and not self._flushing and roteador is not None
+                    and roteador.ativo_na_requisicao()):
+                return roteador.engine
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    return SessaoRoteada
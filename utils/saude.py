@@ -0,0 +1,101 @@
+"""
+Verificações de prontidão (readiness) com resultado em cache
+
+As verificações (banco, pool, cache, uploads...) rodam em uma thread em
+segundo plano a cada `intervalo` segundos; o endpoint apenas lê o último
+resultado. Se uma verificação travar (ex.: pool esgotado esperando conexão),
+o resultado envelhece e passa de `max_idade`, o que também conta como falha.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRONTO = 'pronto'
+DEGRADADO = 'degradado'
+INDISPONIVEL = 'indisponivel'
+
+
+class VerificadorProntidao:
+    """
+    `verificacoes` mapeia nome -> função que retorna um dict com 'ok'.
+    Falhas em `criticas` tornam a instância indisponível (503); as demais
+    apenas marcam o estado como degradado.
+    """
+
+    def __init__(self, app, verificacoes, criticas=(), intervalo=5.0, max_idade=None):
+        self.app = app
+        self.verificacoes = dict(verificacoes)
+        self.criticas = set(criticas)
+        self.intervalo = intervalo
+        self.max_idade = max_idade or intervalo * 3
+        self._resultado = None
+        self._atualizado_em = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def verificar_agora(self):
+        """Executa todas as verificações e guarda o resultado"""
+        resultados = {}
+        for nome, verificacao in self.verificacoes.items():
+            inicio = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    resultado = dict(verificacao())
+            except Exception as e:
+                resultado = {'ok': False, 'erro': str(e)}
+            resultado.setdefault('ok', False)
+            resultado['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            resultado['critica'] = nome in self.criticas
+            resultados[nome] = resultado
+
+        falhas = {nome for nome, resultado in resultados.items() if not resultado['ok']}
+        if falhas and falhas & self.criticas:
+            status = INDISPONIVEL
+        elif falhas:
+            status = DEGRADADO
+        else:
+            status = PRONTO
+
+        anterior = self._resultado['status'] if self._resultado else PRONTO
+        if status != anterior:
+            logger.warning('Prontidão alterada', extra={'de': anterior, 'para': status, 'falhas': sorted(falhas)})
+
+        self._resultado = {'status': status, 'verificacoes': resultados}
+        self._atualizado_em = time.monotonic()
+        return self._resultado
+
+    def resultado(self):
+        """Último resultado, sem executar verificações (exceto na primeira chamada)"""
+        self._iniciar_thread()
+        if self._resultado is None:
+            with self._lock:
+                if self._resultado is None:
+                    self.verificar_agora()
+
+        idade = time.monotonic() - self._atualizado_em
+        resultado = dict(self._resultado, idade_s=round(idade, 2))
+        if idade > self.max_idade:
+            resultado['status'] = INDISPONIVEL
+            resultado['erro'] = f'Verificações sem atualização há {idade:.0f}s'
+        return resultado
+
+    def _iniciar_thread(self):
+        # A thread é criada no primeiro uso para sobreviver ao fork do gunicorn
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._executar, name='prontidao', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.verificar_agora()
+            except Exception:
+                logger.exception('Erro nas verificações de prontidão')
@@ -0,0 +1,230 @@
+"""
+Coleta de resultados do velocímetro (ping, jitter e perda)
+
+Os resultados enviados pelos clientes ficam em um buffer em memória e são
+gravados em lotes por uma thread em segundo plano, evitando um commit por
+envio. Depois de cada gravação, a mesma thread recalcula os percentis por
+plano/localidade a partir dos resultados gravados e os guarda no cache
+compartilhado; a rota de estatísticas apenas lê esse resumo.
+"""
+
+import atexit
+import logging
+import re
+import statistics
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LOCALIDADE_PADRAO = 'Outra'
+
+
+def extrair_localidades(endereco):
+    """Extrai a lista de localidades atendidas da configuração 'endereco'"""
+    if not endereco:
+        return []
+
+    # Formato: "Endereço da loja<br>Localidade A / Localidade B / ..."
+    # (o <br> pode chegar escapado, pois get_configs sanitiza os valores)
+    partes = re.split(r'<br\s*/?>|&lt;br\s*/?&gt;', endereco, maxsplit=1)
+    trecho = partes[1] if len(partes) > 1 else partes[0]
+
+    localidades = []
+    for nome in trecho.split('/'):
+        nome = nome.strip()
+        if nome.endswith(' TO'):
+            nome = nome[:-3].strip()
+        if nome and nome not in localidades:
+            localidades.append(nome)
+    return localidades
+
+
+def calcular_latencia(amostras):
+    """
+    Calcula ping, jitter e perda a partir das amostras de RTT em ms.
+    Amostras perdidas devem ser enviadas como None.
+    """
+    if not amostras:
+        return None
+
+    recebidas = []
+    for valor in amostras:
+        if valor is None:
+            continue
+        if not isinstance(valor, (int, float)) or isinstance(valor, bool):
+            return None
+        if valor < 0 or valor > 60000:
+            return None
+        recebidas.append(float(valor))
+
+    perda = (len(amostras) - len(recebidas)) / len(amostras) * 100
+    if not recebidas:
+        return {'ping_ms': None, 'jitter_ms': None, 'perda_pct': round(perda, 2)}
+
+    # Jitter como média das variações entre amostras consecutivas
+    variacoes = [abs(b - a) for a, b in zip(recebidas, recebidas[1:])]
+    jitter = sum(variacoes) / len(variacoes) if variacoes else 0.0
+
+    return {
+        'ping_ms': round(statistics.median(recebidas), 2),
+        'jitter_ms': round(jitter, 2),
+        'perda_pct': round(perda, 2)
+    }
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por interpolação linear de uma lista já ordenada"""
+    if not valores_ordenados:
+        return None
+    posicao = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fracao = posicao - inferior
+    valor = valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * fracao
+    return round(valor, 2)
+
+
+METRICAS = ('ping_ms', 'jitter_ms', 'perda_pct', 'download_mbps', 'upload_mbps')
+PERCENTIS = (50, 90, 99)
+
+
+def resumir_latencias(resultados, janela=500, max_chaves=200):
+    """
+    Percentis por plano/localidade. `resultados` vem do mais antigo para o
+    mais recente; cada grupo usa apenas os últimos `janela` valores.
+    """
+    amostras = {}
+    for resultado in resultados:
+        chave = (resultado.get('plano_id'), resultado.get('localidade') or LOCALIDADE_PADRAO)
+        if chave not in amostras:
+            if len(amostras) >= max_chaves:
+                continue
+            amostras[chave] = {m: deque(maxlen=janela) for m in METRICAS}
+        for metrica in METRICAS:
+            valor = resultado.get(metrica)
+            if valor is not None:
+                amostras[chave][metrica].append(valor)
+
+    grupos = []
+    for (plano_id, localidade), janelas in amostras.items():
+        grupo = {'plano_id': plano_id, 'localidade': localidade,
+                 'amostras': max(len(v) for v in janelas.values())}
+        for metrica, valores in janelas.items():
+            ordenados = sorted(valores)
+            grupo[metrica] = {f'p{p}': percentil(ordenados, p) for p in PERCENTIS}
+        grupos.append(grupo)
+    return grupos
+
+
+def filtrar_grupos(grupos, plano_id=None, localidade=None):
+    """Filtra os grupos de resumir_latencias por plano e/ou localidade"""
+    return [
+        grupo for grupo in grupos
+        if (plano_id is None or grupo['plano_id'] == plano_id)
+        and (localidade is None or grupo['localidade'] == localidade)
+    ]
+
+
+class BufferResultados:
+    """
+    Buffer em memória gravado em lotes por uma thread em segundo plano.
+    O lote é gravado quando atinge `tamanho_lote` ou a cada `intervalo` segundos.
+    `ao_gravar()` roda na mesma thread depois de um flush que gravou
+    resultados, ou quando pedido por `solicitar_ao_gravar()`.
+    """
+
+    def __init__(self, gravar_lote, tamanho_lote=100, intervalo=5.0, max_pendentes=5000, ao_gravar=None):
+        self.gravar_lote = gravar_lote
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        self.ao_gravar = ao_gravar
+        self.descartados = 0
+        self._ao_gravar_pedido = False
+        self._pendentes = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._evento = threading.Event()
+        self._thread = None
+        self._atexit_registrado = False
+
+    def adicionar(self, resultado):
+        """Enfileira um resultado. Retorna False se o buffer estiver cheio."""
+        with self._lock:
+            if len(self._pendentes) >= self.max_pendentes:
+                self.descartados += 1
+                return False
+            self._pendentes.append(resultado)
+            cheio = len(self._pendentes) >= self.tamanho_lote
+
+        self._iniciar_thread()
+        if cheio:
+            self._evento.set()
+        return True
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    def solicitar_ao_gravar(self):
+        """Pede à thread do buffer que execute `ao_gravar` sem esperar novos resultados"""
+        self._ao_gravar_pedido = True
+        self._iniciar_thread()
+        self._evento.set()
+
+    def flush(self):
+        """Grava todos os resultados pendentes em lotes. Retorna quantos foram gravados."""
+        gravados = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    lote = self._pendentes[:self.tamanho_lote]
+                    del self._pendentes[:self.tamanho_lote]
+                if not lote:
+                    return gravados
+                try:
+                    self.gravar_lote(lote)
+                except Exception as e:
+                    logger.warning("Erro ao gravar lote de resultados do velocímetro (%s); gravando um a um", e)
+                    lote = self._gravar_individualmente(lote)
+                gravados += len(lote)
+
+    def _gravar_individualmente(self, lote):
+        """Após falha do lote, isola os resultados inválidos. Retorna os gravados."""
+        gravados = []
+        for resultado in lote:
+            try:
+                self.gravar_lote([resultado])
+            except Exception as e:
+                logger.warning("Resultado do velocímetro descartado: %s", e)
+                with self._lock:
+                    self.descartados += 1
+                continue
+            gravados.append(resultado)
+        return gravados
+
+    def _iniciar_thread(self):
+        # A thread é criada no primeiro uso para sobreviver ao fork do gunicorn
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._executar, name='velocimetro-buffer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registrado:
+                atexit.register(self.flush)
+                self._atexit_registrado = True
+
+    def _executar(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            gravados = self.flush()
+            if self.ao_gravar and (gravados or self._ao_gravar_pedido):
+                self._ao_gravar_pedido = False
+                try:
+                    self.ao_gravar()
+                except Exception:
+                    logger.exception('Erro após gravar resultados do velocímetro')
@@ -0,0 +1,198 @@
+"""
+Execução de tarefas em segundo plano
+
+As rotas do admin enfileiram o trabalho posterior à escrita (arquivos,
+reconstrução estática, etc.) e retornam imediatamente. Cada tarefa é
+registrada na tabela de tarefas antes de ir para a fila em memória; um pool
+limitado de threads as executa. Se a fila estiver cheia ou o worker
+reiniciar, a tarefa continua pendente no banco e é retomada pelo coletor
+periódico. Falhas são repetidas com backoff exponencial.
+
+Processos sem o pool iniciado (comandos `flask ...`) apenas gravam a tarefa:
+um processo curto não pode assumi-la, pois terminaria com ela em execução.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+
+class ExecutorTarefas:
+    """Pool limitado de threads com a tabela de tarefas como fallback durável"""
+
+    def __init__(self, app, db, modelo, trabalhadores=2, tamanho_fila=100,
+                 max_tentativas=5, backoff_base=2.0, intervalo_coleta=10.0, tempo_travada=600):
+        self.app = app
+        self.db = db
+        self.modelo = modelo
+        self.trabalhadores = trabalhadores
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.intervalo_coleta = intervalo_coleta
+        self.tempo_travada = tempo_travada
+        self.funcoes = {}
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def tarefa(self, nome):
+        """Decorator que registra uma função como tarefa"""
+        def decorador(funcao):
+            self.funcoes[nome] = funcao
+            return funcao
+        return decorador
+
+    def enfileirar(self, nome, unica=False, **argumentos):
+        """
+        Registra a tarefa e, se o pool deste processo estiver iniciado, a entrega
+        a ele. Com `unica=True`, não cria outra se já existir uma pendente com o
+        mesmo nome e argumentos.
+        Deve ser chamada dentro de um contexto de aplicação.
+        """
+        if nome not in self.funcoes:
+            raise ValueError(f"Tarefa desconhecida: {nome}")
+
+        argumentos_json = json.dumps(argumentos, sort_keys=True)
+        if unica:
+            existente = self.modelo.query.filter_by(
+                nome=nome, argumentos=argumentos_json, status=PENDENTE
+            ).first()
+            if existente is not None:
+                return existente.id
+
+        tarefa = self.modelo(nome=nome, argumentos=argumentos_json, status=PENDENTE,
+                             executar_em=datetime.utcnow())
+        self.db.session.add(tarefa)
+        self.db.session.commit()
+
+        if not self._threads:
+            # Fora do servidor web: o coletor de um worker a executa
+            return tarefa.id
+        try:
+            self._fila.put_nowait(tarefa.id)
+        except queue.Full:
+            # Continua pendente no banco; o coletor periódico a executa depois
+            pass
+        return tarefa.id
+
+    def iniciar(self):
+        """Inicia as threads do pool e o coletor (uma vez por processo)"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.trabalhadores):
+                thread = threading.Thread(target=self._trabalhar, name=f'tarefas-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            coletor = threading.Thread(target=self._coletar, name='tarefas-coletor', daemon=True)
+            coletor.start()
+            self._threads.append(coletor)
+
+    def _trabalhar(self):
+        while True:
+            tarefa_id = self._fila.get()
+            try:
+                with self.app.app_context():
+                    self.executar(tarefa_id)
+            except Exception:
+                logger.exception("Erro no executor de tarefas")
+            finally:
+                self._fila.task_done()
+
+    def _coletar(self):
+        while True:
+            time.sleep(self.intervalo_coleta)
+            try:
+                with self.app.app_context():
+                    self.coletar_pendentes()
+            except Exception:
+                logger.exception("Erro ao coletar tarefas pendentes")
+
+    def coletar_pendentes(self):
+        """Reenfileira tarefas vencidas e recupera as travadas por um worker que caiu"""
+        Tarefa = self.modelo
+        agora = datetime.utcnow()
+
+        Tarefa.query.filter(
+            Tarefa.status == EXECUTANDO,
+            Tarefa.iniciada_em < agora - timedelta(seconds=self.tempo_travada)
+        ).update({'status': PENDENTE}, synchronize_session=False)
+        self.db.session.commit()
+
+        livres = self._fila.maxsize - self._fila.qsize()
+        if livres <= 0:
+            return 0
+        ids = [id_ for (id_,) in self.db.session.query(Tarefa.id).filter(
+            Tarefa.status == PENDENTE,
+            Tarefa.executar_em <= agora
+        ).order_by(Tarefa.executar_em).limit(livres)]
+        for tarefa_id in ids:
+            try:
+                self._fila.put_nowait(tarefa_id)
+            except queue.Full:
+                break
+        return len(ids)
+
+    def executar(self, tarefa_id):
+        """Executa uma tarefa, registrando duração, tentativas e erro"""
+        Tarefa = self.modelo
+
+        # Reivindica a tarefa; outro worker pode já tê-la pego pelo coletor
+        reivindicada = Tarefa.query.filter_by(id=tarefa_id, status=PENDENTE).update(
+            {'status': EXECUTANDO, 'iniciada_em': datetime.utcnow()}, synchronize_session=False
+        )
+        self.db.session.commit()
+        if not reivindicada:
+            return False
+
+        tarefa = self.db.session.get(Tarefa, tarefa_id)
+        inicio = time.perf_counter()
+        try:
+            self.funcoes[tarefa.nome](**json.loads(tarefa.argumentos or '{}'))
+        except Exception as e:
+            self.db.session.rollback()
+            tarefa = self.db.session.get(Tarefa, tarefa_id)
+            tarefa.tentativas += 1
+            tarefa.duracao_ms = (time.perf_counter() - inicio) * 1000
+            tarefa.erro = f"{e}\n{traceback.format_exc(limit=5)}"
+            if tarefa.tentativas >= self.max_tentativas:
+                tarefa.status = FALHOU
+                tarefa.concluida_em = datetime.utcnow()
+            else:
+                atraso = self.backoff_base ** tarefa.tentativas
+                tarefa.status = PENDENTE
+                tarefa.executar_em = datetime.utcnow() + timedelta(seconds=atraso)
+            self.db.session.commit()
+            return False
+
+        tarefa.status = CONCLUIDA
+        tarefa.tentativas += 1
+        tarefa.duracao_ms = (time.perf_counter() - inicio) * 1000
+        tarefa.concluida_em = datetime.utcnow()
+        tarefa.erro = None
+        self.db.session.commit()
+        return True
+
+    def resumo(self):
+        """Contagem por status e estado da fila em memória"""
+        Tarefa = self.modelo
+        contagem = dict(self.db.session.query(Tarefa.status, self.db.func.count(Tarefa.id)).group_by(Tarefa.status))
+        return {
+            'por_status': {status: contagem.get(status, 0) for status in (PENDENTE, EXECUTANDO, CONCLUIDA, FALHOU)},
+            'fila': self._fila.qsize(),
+            'capacidade_fila': self._fila.maxsize,
+            'trabalhadores': self.trabalhadores,
+        }
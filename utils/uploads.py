@@ -0,0 +1,207 @@
+"""
+Validação de uploads de imagem em fluxo
+
+O parser multipart do Werkzeug grava cada bloco recebido em um
+ArquivoEmValidacao (via Request._get_file_stream), que extrai o tipo real
+(magic bytes) e as dimensões do cabeçalho enquanto o corpo ainda está
+chegando. Tipo inválido, dimensões ou tamanho acima do limite interrompem o
+parsing com UploadRecusado, sem ler nem gravar o restante do corpo; arquivos
+válidos já estão no temporário da pasta de destino e são movidos com
+os.replace (atômico).
+"""
+
+import os
+import struct
+import tempfile
+
+from werkzeug.exceptions import BadRequest
+
+TAMANHO_BLOCO = 64 * 1024
+
+# JPEG pode ter EXIF/miniaturas antes do SOF; além disso o arquivo é recusado
+MAX_CABECALHO = 256 * 1024
+
+# Marcadores SOF do JPEG que carregam as dimensões (exclui DHT, JPG e DAC)
+MARCADORES_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class UploadInvalido(ValueError):
+    """Upload recusado durante a validação"""
+
+
+class UploadRecusado(BadRequest):
+    """
+    Interrompe o parsing do formulário. Não é ValueError de propósito: o
+    FormDataParser engoliria o erro e devolveria o formulário vazio.
+    """
+
+
+def detectar_tipo(cabecalho):
+    """Identifica o formato pelos magic bytes. Retorna a extensão ou None."""
+    if cabecalho.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if cabecalho.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if cabecalho[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if cabecalho[:4] == b'RIFF' and cabecalho[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _dimensoes_png(cabecalho):
+    if len(cabecalho) < 24 or cabecalho[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', cabecalho[16:24])
+
+
+def _dimensoes_gif(cabecalho):
+    if len(cabecalho) < 10:
+        return None
+    return struct.unpack('<HH', cabecalho[6:10])
+
+
+def _dimensoes_webp(cabecalho):
+    if len(cabecalho) < 30:
+        return None
+    bloco = cabecalho[12:16]
+    if bloco == b'VP8 ':
+        largura, altura = struct.unpack('<HH', cabecalho[26:30])
+        return largura & 0x3FFF, altura & 0x3FFF
+    if bloco == b'VP8L':
+        b0, b1, b2, b3 = cabecalho[21:25]
+        largura = 1 + (((b1 & 0x3F) << 8) | b0)
+        altura = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return largura, altura
+    if bloco == b'VP8X':
+        largura = 1 + int.from_bytes(cabecalho[24:27], 'little')
+        altura = 1 + int.from_bytes(cabecalho[27:30], 'little')
+        return largura, altura
+    raise UploadInvalido("Cabeçalho WebP inválido")
+
+
+def _dimensoes_jpeg(cabecalho):
+    posicao = 2
+    while posicao + 4 <= len(cabecalho):
+        if cabecalho[posicao] != 0xFF:
+            raise UploadInvalido("Cabeçalho JPEG inválido")
+        marcador = cabecalho[posicao + 1]
+        if marcador == 0xFF:
+            posicao += 1
+            continue
+        if marcador in (0xD8, 0x01) or 0xD0 <= marcador <= 0xD7:
+            posicao += 2
+            continue
+        if marcador in (0xD9, 0xDA):
+            raise UploadInvalido("JPEG sem dimensões no cabeçalho")
+        tamanho = struct.unpack('>H', cabecalho[posicao + 2:posicao + 4])[0]
+        if marcador in MARCADORES_SOF:
+            if posicao + 9 > len(cabecalho):
+                return None
+            altura, largura = struct.unpack('>HH', cabecalho[posicao + 5:posicao + 9])
+            return largura, altura
+        posicao += 2 + tamanho
+    return None
+
+
+LEITORES_DIMENSOES = {
+    'png': _dimensoes_png,
+    'jpg': _dimensoes_jpeg,
+    'gif': _dimensoes_gif,
+    'webp': _dimensoes_webp,
+}
+
+
+def detectar_dimensoes(tipo, cabecalho):
+    """Lê (largura, altura) do cabeçalho. Retorna None se faltarem bytes."""
+    return LEITORES_DIMENSOES[tipo](cabecalho)
+
+
+class ValidadorImagem:
+    """Valida a imagem incrementalmente, bloco a bloco, conforme ela chega"""
+
+    def __init__(self, max_bytes, max_dimensao, tipos_permitidos):
+        self.max_bytes = max_bytes
+        self.max_dimensao = max_dimensao
+        self.tipos_permitidos = tipos_permitidos
+        self.total = 0
+        self.tipo = None
+        self.dimensoes = None
+        self._cabecalho = b''
+
+    def alimentar(self, bloco):
+        self.total += len(bloco)
+        if self.total > self.max_bytes:
+            raise UploadInvalido("Arquivo excede o tamanho máximo permitido")
+        if self.dimensoes is not None:
+            return
+
+        self._cabecalho += bloco
+        if self.tipo is None and len(self._cabecalho) >= 12:
+            self.tipo = detectar_tipo(self._cabecalho)
+            if self.tipo is None or self.tipo not in self.tipos_permitidos:
+                raise UploadInvalido("Tipo de arquivo não permitido")
+        if self.tipo is not None:
+            self.dimensoes = detectar_dimensoes(self.tipo, self._cabecalho)
+        if self.dimensoes is not None:
+            largura, altura = self.dimensoes
+            if not largura or not altura:
+                raise UploadInvalido("Dimensões da imagem inválidas")
+            if largura > self.max_dimensao or altura > self.max_dimensao:
+                raise UploadInvalido(f"Imagem excede {self.max_dimensao}px")
+            self._cabecalho = b''
+        elif len(self._cabecalho) > MAX_CABECALHO:
+            raise UploadInvalido("Não foi possível ler as dimensões da imagem")
+
+    def concluir(self):
+        """Retorna a extensão do tipo detectado; falha se a imagem veio incompleta"""
+        if self.dimensoes is None:
+            raise UploadInvalido("Arquivo vazio ou imagem incompleta")
+        return self.tipo
+
+
+class ArquivoEmValidacao:
+    """
+    Arquivo temporário na pasta de destino que valida cada bloco antes de
+    gravá-lo. Usado como stream do FileStorage: `salvar()` move o temporário
+    para o nome final; `close()` (chamado no fim da requisição) remove o que
+    não foi salvo.
+    """
+
+    def __init__(self, pasta, max_bytes, max_dimensao, tipos_permitidos):
+        os.makedirs(pasta, exist_ok=True)
+        self.pasta = pasta
+        self.validador = ValidadorImagem(max_bytes, max_dimensao, tipos_permitidos)
+        fd, self._temporario = tempfile.mkstemp(dir=pasta, prefix='.upload-', suffix='.tmp')
+        self._arquivo = os.fdopen(fd, 'w+b')
+
+    def write(self, bloco):
+        try:
+            self.validador.alimentar(bloco)
+        except UploadInvalido as e:
+            self.close()
+            raise UploadRecusado(str(e)) from e
+        return self._arquivo.write(bloco)
+
+    def __getattr__(self, nome):
+        # read/readline/seek/tell... para o FileStorage
+        if nome.startswith('_'):
+            raise AttributeError(nome)
+        return getattr(self._arquivo, nome)
+
+    def salvar(self, nome_base):
+        """Move o arquivo validado para `nome_base.<tipo>` e retorna esse nome"""
+        tipo = self.validador.concluir()
+        nome_final = f"{nome_base}.{tipo}"
+        self._arquivo.close()
+        # mkstemp cria com 0600; o arquivo precisa ser legível pelo servidor de estáticos
+        os.chmod(self._temporario, 0o644)
+        os.replace(self._temporario, os.path.join(self.pasta, nome_final))
+        self._temporario = None
+        return nome_final
+
+    def close(self):
+        self._arquivo.close()
+        if self._temporario is not None and os.path.exists(self._temporario):
+            os.remove(self._temporario)
+        self._temporario = None